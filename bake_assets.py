@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import argparse
+
+import pygame
+
+from scripts.asset_pack import HEADER, MAGIC, PACK_PATH, PAGE_FORMATS, image_key
+from scripts.utils import BASE_IMG_PATH, load_image, load_images, packs
+
+# every (path, conversion, size) that game.py and editor.py load; anything
+# missing here still loads from its PNG
+PACKED_IMAGES = [
+    ("tiles/decor", 0, None),
+    ("tiles/grass", 0, None),
+    ("tiles/wall", 0, None),
+    ("tiles/block", 0, None),
+    ("tiles/large_decor", 0, None),
+    ("tiles/stone", 0, None),
+    ("tiles/spawners", 0, None),
+    ("tiles/jump_pad", 0, (16, 16)),
+    ("tiles/lever", 1, (16, 16)),
+    ("entities/player.png", 0, None),
+    ("background.png", 0, None),
+    ("star.png", 1, None),
+    ("clouds", 0, None),
+    ("entities/enemy/idle", 0, None),
+    ("entities/enemy/run", 0, None),
+    ("entities/enemy1/idle", 0, None),
+    ("entities/enemy1/run", 0, None),
+    ("entities/dragon/idle", 1, None),
+    ("entities/dragon/run", 1, None),
+    ("entities/dragon/attack", 1, None),
+    ("entities/player/idle", 0, None),
+    ("entities/player/run", 0, None),
+    ("entities/player/jump", 0, None),
+    ("entities/player/slide", 0, None),
+    ("entities/player/wall_slide", 0, None),
+    ("particles/leaf", 0, None),
+    ("particles/particle", 0, None),
+    ("gun.png", 0, None),
+    ("projectile.png", 0, None),
+    ("projectile5.png", 1, None),
+    ("dust1.png", 1, (200, 200)),
+    ("broken_wall", 0, None),
+    ("jump_pad", 0, (16, 16)),
+    ("lever", 1, (16, 16)),
+]
+
+PAGE_SIZE = 1024
+# transparent gap between images on a page
+PADDING = 1
+
+
+def pack_pages(images, page_size=PAGE_SIZE):
+    # shelf packing, tallest images first: fills rows left to right and starts
+    # a new page when a row doesn't fit under the last one
+    width = max(page_size, max(img.get_width() for img in images) + PADDING)
+    order = sorted(range(len(images)), key=lambda i: (-images[i].get_height(), i))
+    pages = []
+    places = [None] * len(images)
+    x = y = row_height = 0
+    for i in order:
+        w, h = images[i].get_size()
+        if x + w > width:
+            x = 0
+            y += row_height + PADDING
+            row_height = 0
+        if not pages or (y and y + h > page_size):
+            pages.append(None)
+            x = y = row_height = 0
+        places[i] = (len(pages) - 1, x, y, w, h)
+        x += w + PADDING
+        row_height = max(row_height, h)
+        pages[-1] = (width, y + row_height)
+    return pages, places
+
+
+def bake(out=PACK_PATH, page_size=PAGE_SIZE):
+    # the images go through load_image, so the pack holds exactly the pixels
+    # (conversion and scaling included) the game would otherwise produce
+    packs[PACK_PATH] = None
+    groups = {0: [], 1: []}
+    for path, conversion, size in PACKED_IMAGES:
+        if path.endswith(".png"):
+            frames = [load_image(path, conversion, size)]
+        else:
+            frames = load_images(path, conversion, size)
+        groups[conversion].append((image_key(path, conversion, size), frames))
+
+    index = {"pages": [], "images": {}}
+    page_data = []
+    offset = 0
+    for conversion, entries in groups.items():
+        images = [img for key, frames in entries for img in frames]
+        pages, places = pack_pages(images, page_size)
+        first_page = len(page_data)
+        for n, size in enumerate(pages):
+            if conversion == 0:
+                page = pygame.Surface(size)
+            else:
+                page = pygame.Surface(size, pygame.SRCALPHA)
+            for img, (i, x, y, w, h) in zip(images, places):
+                if i == n:
+                    # adding onto the transparent page copies alpha as is
+                    flags = pygame.BLEND_RGBA_ADD if conversion else 0
+                    page.blit(img, (x, y), special_flags=flags)
+            data = pygame.image.tobytes(page, PAGE_FORMATS[conversion][0])
+            # offsets count from the end of the index
+            index["pages"].append([offset, *size, conversion])
+            page_data.append(data)
+            offset += len(data)
+
+        places = iter(places)
+        for key, frames in entries:
+            index["images"][key] = [
+                [first_page + i, x, y, w, h]
+                for i, x, y, w, h in (next(places) for img in frames)
+            ]
+
+    index_data = json.dumps(index, separators=(",", ":")).encode()
+    with open(out, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(index_data)))
+        f.write(index_data)
+        for data in page_data:
+            f.write(data)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="pack the game's images into raw atlas pages"
+    )
+    parser.add_argument("--out", default=PACK_PATH)
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    pygame.init()
+    # convert() needs a display mode
+    pygame.display.set_mode((1, 1))
+
+    start = time.perf_counter()
+    index = bake(args.out, args.page_size)
+    print(
+        f"Packed {sum(len(frames) for frames in index['images'].values())} images "
+        f"from {BASE_IMG_PATH} into {len(index['pages'])} pages, "
+        f"{os.path.getsize(args.out) // 1024}K, "
+        f"in {time.perf_counter() - start:.2f}s: {args.out}"
+    )
+
+
+if __name__ == "__main__":
+    main()
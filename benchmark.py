@@ -0,0 +1,173 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+
+import pygame
+
+from game import Game, LEVELS
+from scripts.presentation import SCALE_MODES, parse_window_size
+from scripts.sprite_cache import sprite_cache
+
+MAP_DIRS = ["data/final maps", "data/extra_maps"]
+
+
+def benchmark_levels():
+    levels = list(LEVELS)
+    for map_dir in MAP_DIRS:
+        for filename in sorted(os.listdir(map_dir)):
+            if filename.endswith(".json"):
+                levels.append(map_dir + "/" + filename)
+    return levels
+
+
+class InputScript:
+    """Deterministic stand-in for a player: runs back and forth, jumps,
+    dashes, shoots and cycles through the weapons on a fixed schedule."""
+
+    def __init__(self, game):
+        self.game = game
+
+    def key(self, event_type, key):
+        self.game.handle_event(pygame.event.Event(event_type, key=key))
+
+    def feed(self, frame):
+        if frame % 180 == 0:
+            self.key(pygame.KEYUP, pygame.K_LEFT)
+            self.key(pygame.KEYDOWN, pygame.K_RIGHT)
+        elif frame % 180 == 90:
+            self.key(pygame.KEYUP, pygame.K_RIGHT)
+            self.key(pygame.KEYDOWN, pygame.K_LEFT)
+        if frame % 40 == 0:
+            self.key(pygame.KEYDOWN, pygame.K_UP)
+        if frame % 75 == 0:
+            self.key(pygame.KEYDOWN, pygame.K_x)
+        if frame % 15 == 0:
+            self.key(pygame.KEYDOWN, pygame.K_z)
+        if frame % 240 == 0:
+            self.key(pygame.KEYDOWN, pygame.K_c)
+
+
+def summarize(samples):
+    samples_ms = [sample * 1000 for sample in samples]
+    percentiles = statistics.quantiles(samples_ms, n=100)
+    return {
+        "mean": statistics.fmean(samples_ms),
+        "p95": percentiles[94],
+        "p99": percentiles[98],
+        "max": max(samples_ms),
+    }
+
+
+def run_level(game, map_id, frames, warmup):
+    game.load_level(map_id)
+    game.movement = [False, False]
+    script = InputScript(game)
+    update_times = []
+    render_times = []
+    reloads = 0
+    game.profiler.enabled = True
+
+    for frame in range(warmup + frames):
+        # the player always carries the gun so every weapon type gets exercised
+        game.gun = True
+        game.audio.new_frame()
+        script.feed(frame)
+        if frame == warmup:
+            game.profiler.reset()
+            for pool in game.pools.values():
+                pool.reset_stats()
+            sprite_cache.reset_stats()
+            game.audio.reset_stats()
+
+        game.profiler.begin_frame()
+        start = time.perf_counter()
+        game.update()
+        updated = time.perf_counter()
+        game.render()
+        rendered = time.perf_counter()
+        game.profiler.end_frame(game.frame, map_id)
+        pygame.event.pump()
+
+        if frame >= warmup:
+            update_times.append(updated - start)
+            render_times.append(rendered - updated)
+
+        # clearing a level advances the game; keep measuring the same map
+        if game.map_id != map_id:
+            game.load_level(map_id)
+            reloads += 1
+
+    frame_times = [u + r for u, r in zip(update_times, render_times)]
+    return {
+        "tiles": len(game.tilemap.tilemap),
+        "frames": frames,
+        "reloads": reloads,
+        "frame_ms": summarize(frame_times),
+        "update_ms": summarize(update_times),
+        "render_ms": summarize(render_times),
+        "fps": frames / sum(frame_times),
+        "update_fps": frames / sum(update_times),
+        "render_fps": frames / sum(render_times),
+        "phases_ms": game.profiler.means(),
+        "pools": {name: pool.stats() for name, pool in game.pools.items()},
+        "sprite_cache": sprite_cache.stats(),
+        "assets": game.assets.stats(),
+        "audio": game.audio.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="per-level frame time benchmark with scripted input"
+    )
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--warmup", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--levels",
+        nargs="*",
+        help="level names or map paths to run (default: every level)",
+    )
+    parser.add_argument("--scale-mode", default="smooth", choices=SCALE_MODES)
+    parser.add_argument("--window", default="640x480", type=parse_window_size)
+    parser.add_argument("--out", default="benchmark.json")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    game = Game(headless=True, scale_mode=args.scale_mode, window_size=args.window)
+
+    results = {}
+    for map_id in args.levels or benchmark_levels():
+        random.seed(args.seed)
+        results[map_id] = run_level(game, map_id, args.frames, args.warmup)
+        frame_ms = results[map_id]["frame_ms"]
+        print(
+            f"{map_id:32} mean {frame_ms['mean']:6.2f}ms  "
+            f"p95 {frame_ms['p95']:6.2f}ms  p99 {frame_ms['p99']:6.2f}ms  "
+            f"update {results[map_id]['update_fps']:7.0f}/s  "
+            f"render {results[map_id]['render_fps']:7.0f}/s"
+        )
+
+    report = {
+        "frames": args.frames,
+        "warmup": args.warmup,
+        "seed": args.seed,
+        "scale_mode": args.scale_mode,
+        "window": list(args.window),
+        "python": sys.version.split()[0],
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "levels": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+import sys
+import random
+import argparse
+
+import numpy as np
+import pygame
+
+from game import Game
+from benchmark import InputScript
+from scripts.presentation import SCALE_MODES, parse_window_size
+
+WINDOWS = [(640, 480), (800, 480), (640, 600), (1000, 540)]
+
+
+def check(game, map_id, frames, seed):
+    # plays map_id with scripted input and counts the window pixels that
+    # changed from one frame to the next without being in a pushed rect
+    pushed = []
+    update = pygame.display.update
+    pygame.display.update = lambda rects=None: pushed.append(rects)
+    try:
+        random.seed(seed)
+        game.load_level(map_id)
+        script = InputScript(game)
+        window = game.screen.get_rect()
+        last = None
+        partial = 0
+        uncovered = 0
+        for frame in range(frames):
+            game.gun = True
+            game.audio.new_frame()
+            script.feed(frame)
+            game.update()
+            pushed.clear()
+            game.render()
+            pixels = pygame.surfarray.pixels2d(game.screen).copy()
+            rects = pushed[-1]
+            if rects is not None and last is not None:
+                partial += 1
+                changed = pixels != last
+                for rect in rects:
+                    rect = rect.clip(window)
+                    changed[rect.left : rect.right, rect.top : rect.bottom] = False
+                uncovered += int(np.count_nonzero(changed))
+            last = pixels
+    finally:
+        pygame.display.update = update
+    return partial, uncovered
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="check that --dirty-rects pushes every window pixel that "
+        "changed, for several window shapes"
+    )
+    parser.add_argument("--levels", nargs="*", default=["Easy-1", "Insane-1"])
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--windows", nargs="*", default=WINDOWS, type=parse_window_size)
+    parser.add_argument(
+        "--scale-modes", nargs="*", default=["smooth", "nearest"], choices=SCALE_MODES
+    )
+    args = parser.parse_args()
+
+    failed = False
+    for mode in args.scale_modes:
+        for window_size in args.windows:
+            game = Game(
+                headless=True,
+                scale_mode=mode,
+                window_size=window_size,
+                dirty_rects=True,
+            )
+            for map_id in args.levels:
+                partial, uncovered = check(game, map_id, args.frames, args.seed)
+                failed = failed or uncovered > 0
+                size = f"{window_size[0]}x{window_size[1]}"
+                print(
+                    f"{mode:8} {size:10} {map_id:12} "
+                    f"partial updates {partial:4}  uncovered pixels {uncovered}"
+                )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+import os
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from map_convert import MAP_DIRS
+from scripts.level import (
+    MANIFEST_PATH,
+    PreparedLevel,
+    campaign_levels,
+    map_path,
+    metadata_path,
+    metadata_version,
+)
+
+
+def map_ids():
+    # campaign levels go by name, the other maps by path, like the game and the
+    # benchmark refer to them
+    ids = campaign_levels(MAP_DIRS[0])
+    for map_dir in MAP_DIRS[1:]:
+        for filename in sorted(os.listdir(map_dir)):
+            if filename.endswith(".json"):
+                ids.append(map_dir + "/" + filename)
+    return ids
+
+
+def compile_level(map_id):
+    # runs in a worker process; writes the .meta file next to the map
+    level = PreparedLevel(None, map_id, use_metadata=False)
+    meta = {"version": metadata_version(), **level.metadata()}
+    path = map_path(map_id)
+    with open(metadata_path(path), "w") as f:
+        json.dump(meta, f, separators=(",", ":"))
+    return {
+        "id": map_id,
+        "path": path,
+        "meta": metadata_path(path),
+        "tiles": sum(meta["tile_counts"].values()),
+        "tile_counts": meta["tile_counts"],
+        "lowest_block": meta["lowest_block"],
+        "spawners": len(meta["spawners"]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="precompute the map-only part of loading each level and write "
+        "the level manifest"
+    )
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--manifest", default=MANIFEST_PATH)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        maps = list(pool.map(compile_level, map_ids()))
+
+    manifest = {
+        "version": metadata_version(),
+        "levels": campaign_levels(MAP_DIRS[0]),
+        "maps": maps,
+    }
+    with open(args.manifest, "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(
+        f"Compiled {len(maps)} maps in {time.perf_counter() - start:.2f}s; "
+        f"{len(manifest['levels'])} campaign levels in {args.manifest}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -25,20 +25,11 @@ class Editor:
             "large_decor": load_images("tiles/large_decor"),
             "stone": load_images("tiles/stone"),
             "spawners": load_images("tiles/spawners"),
-            "jump_pad": load_images("tiles/jump_pad"),
-            "lever": load_images("tiles/lever", 1),
+            "jump_pad": load_images("tiles/jump_pad", size=(16, 16)),
+            "lever": load_images("tiles/lever", 1, size=(16, 16)),
             "block": load_images("tiles/block"),
         }
 
-        for i in range(len(self.assets["jump_pad"])):
-            self.assets["jump_pad"][i] = pygame.transform.scale(
-                self.assets["jump_pad"][i], [16, 16]
-            )
-        for i in range(len(self.assets["lever"])):
-            self.assets["lever"][i] = pygame.transform.scale(
-                self.assets["lever"][i], [16, 16]
-            )
-
         self.movement = [False, False, False, False]
 
         self.tilemap = Tilemap(self, tile_size=16)
@@ -132,16 +123,18 @@ class Editor:
                 self.display.blit(current_tile_img, mpos)
 
             if self.clicking and self.ongrid:
-                self.tilemap.tilemap[str(tile_pos[0]) + ";" + str(tile_pos[1])] = {
-                    "type": self.tile_list[self.tile_group],
-                    "variant": self.tile_variant,
-                    "pos": tile_pos,
-                    "blockShake": 0,
-                }
+                self.tilemap.set_tile(
+                    tile_pos,
+                    {
+                        "type": self.tile_list[self.tile_group],
+                        "variant": self.tile_variant,
+                        "pos": list(tile_pos),
+                        "blockShake": 0,
+                    },
+                )
             if self.right_clicking:
-                tile_loc = str(tile_pos[0]) + ";" + str(tile_pos[1])
-                if tile_loc in self.tilemap.tilemap:
-                    del self.tilemap.tilemap[tile_loc]
+                if tile_pos in self.tilemap.tilemap:
+                    self.tilemap.remove_tile(tile_pos)
                 for tile in self.tilemap.offgrid_tiles.copy():
                     tile_img = self.assets[tile["type"]][tile["variant"]]
                     tile_r = pygame.Rect(
@@ -151,7 +144,7 @@ class Editor:
                         tile_img.get_height(),
                     )
                     if tile_r.collidepoint(mpos):
-                        self.tilemap.offgrid_tiles.remove(tile)
+                        self.tilemap.remove_offgrid(tile)
 
             self.display.blit(current_tile_img, (5, 5))
 
@@ -165,7 +158,7 @@ class Editor:
                     if event.button == 1:
                         self.clicking = True
                         if not self.ongrid:
-                            self.tilemap.offgrid_tiles.append(
+                            self.tilemap.add_offgrid(
                                 {
                                     "type": self.tile_list[self.tile_group],
                                     "variant": self.tile_variant,
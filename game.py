@@ -2,48 +2,65 @@ import sys
 import math
 import random
 import os
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 import pygame
 
 from scripts.utils import load_image, load_images, Animation
+from scripts.assets import AssetRegistry
+from scripts.audio import AudioManager, SoundEffect, audio_path, SFX, SFX_VOLUMES, MUSIC
 from scripts.entities import PhysicsEntity, Player, Enemy
-from scripts.tilemap import Tilemap
+from scripts.level import PreparedLevel, DUST_LEVELS, load_levels
 from scripts.clouds import Clouds
-from scripts.particles import Particle
-from scripts.spark import Spark
+from scripts.particles import ParticleSystem
+from scripts.spark import SparkSystem
 from scripts.projectile import Projectile
 from scripts.dust import Dust
 from scripts.pieces import Piece
 from scripts.jump_pad import JumpPad
 from scripts.lever import Lever
+from scripts.profiler import FrameProfiler
+from scripts.spatial_hash import SpatialHash
+from scripts.pool import Pool
+from scripts.sprite_cache import sprite_cache
+from scripts.outline import OutlineSurface
+from scripts.presentation import Presenter, SCALE_MODES, parse_window_size
 
-LEVELS = [
-    "Easy-1",
-    "Easy-2",
-    "Easy-3",
-    "Easy-4",
-    "Easy-5",
-    "Easy-6",
-    "Medium-1",
-    "Medium-2",
-    "Medium-3",
-    "Medium-4",
-    "Medium-5",
-    "Medium-6",
-    "Hard-1",
-    "Hard-2",
-    "Insane-1",
-    "Insane-2",
-]
+# campaign order, from the manifest compile_levels.py writes
+LEVELS = load_levels()
+
+# night skies are baked into this many frames, each shown for STAR_FRAME_TIME
+STAR_FRAMES = 4
+STAR_FRAME_TIME = 20
 
 
 class Game:
-    def __init__(self):
+    def __init__(
+        self,
+        headless=False,
+        level=0,
+        profiler=None,
+        scale_mode="smooth",
+        window_size=(640, 480),
+        dirty_rects=False,
+    ):
+        self.headless = headless
+        # only push the parts of the window that changed when the view is still
+        self.dirty_rects = dirty_rects
+        self.last_view = None
+        self.last_rects = []
+        self.profiler = profiler or FrameProfiler()
+        if self.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
         pygame.init()
 
         pygame.display.set_caption("ninja game")
-        self.screen = pygame.display.set_mode((640, 480))
-        self.display = pygame.Surface((320, 240), pygame.SRCALPHA)
+        self.presenter = Presenter((320, 240), window_size, scale_mode)
+        self.screen = self.presenter.screen
+        self.display = OutlineSurface((320, 240))
         self.display_2 = pygame.Surface((320, 240))
 
         self.clock = pygame.time.Clock()
@@ -51,123 +68,166 @@ class Game:
         self.movement = [False, False]
         self.gravity = 0.1
 
-        self.assets = {
-            "decor": load_images("tiles/decor"),
-            "grass": load_images("tiles/grass"),
-            "wall": load_images("tiles/wall"),
-            "block": load_images("tiles/block"),
-            "large_decor": load_images("tiles/large_decor"),
-            "stone": load_images("tiles/stone"),
-            "player": load_image("entities/player.png"),
-            "background": load_image("background.png"),
-            "stars": load_image("star.png"),
-            "clouds": load_images("clouds"),
-            "enemy/idle": Animation(load_images("entities/enemy/idle"), img_dur=6),
-            "enemy/run": Animation(load_images("entities/enemy/run"), img_dur=4),
-            "enemy1/idle": Animation(load_images("entities/enemy1/idle"), img_dur=6),
-            "enemy1/run": Animation(load_images("entities/enemy1/run"), img_dur=4),
-            "dragon/idle": Animation(
-                load_images("entities/dragon/idle", 1), img_dur=10
-            ),
-            "dragon/run": Animation(load_images("entities/dragon/run", 1), img_dur=10),
-            "dragon/attack": Animation(
-                load_images("entities/dragon/attack", 1), img_dur=10, loop=False
-            ),
-            "player/idle": Animation(load_images("entities/player/idle"), img_dur=6),
-            "player/run": Animation(load_images("entities/player/run"), img_dur=4),
-            "player/jump": Animation(load_images("entities/player/jump")),
-            "player/slide": Animation(load_images("entities/player/slide")),
-            "player/wall_slide": Animation(load_images("entities/player/wall_slide")),
-            "particle/leaf": Animation(
-                load_images("particles/leaf"), img_dur=20, loop=False
-            ),
-            "particle/particle": Animation(
-                load_images("particles/particle"), img_dur=6, loop=False
-            ),
-            "gun": load_image("gun.png"),
-            "projectile": load_image("projectile.png"),
-            "projectile2": load_image("projectile5.png", 1),
-            "dust": load_image("dust1.png", 1),
-            "pieces": load_images("broken_wall"),
-            "jump_pad_anim": Animation(load_images("jump_pad"), img_dur=6, loop=False),
-            "lever": Animation(load_images("lever", 1), img_dur=10, loop=False),
-        }
-
-        self.sfx = {
-            "jump": pygame.mixer.Sound("data/sfx/jump.wav"),
-            "dash": pygame.mixer.Sound("data/sfx/dash.wav"),
-            "hit": pygame.mixer.Sound("data/sfx/hit.wav"),
-            "shoot": pygame.mixer.Sound("data/sfx/shoot.wav"),
-            "ambience": pygame.mixer.Sound("data/sfx/ambience.wav"),
-            "wall": pygame.mixer.Sound("data/sfx/break5.wav"),
-            "jump_pad": pygame.mixer.Sound("data/sfx/jump_pad.mp3"),
-        }
-
-        for i in range(len(self.assets["jump_pad_anim"].images)):
-            self.assets["jump_pad_anim"].images[i] = pygame.transform.scale(
-                self.assets["jump_pad_anim"].images[i], [16, 16]
-            )
-
-        for i in range(len(self.assets["lever"].images)):
-            self.assets["lever"].images[i] = pygame.transform.scale(
-                self.assets["lever"].images[i], [16, 16]
-            )
+        # loaded on first use; load_level prefetches what a level needs
+        self.assets = AssetRegistry(
+            {
+                "decor": lambda: load_images("tiles/decor"),
+                "grass": lambda: load_images("tiles/grass"),
+                "wall": lambda: load_images("tiles/wall"),
+                "block": lambda: load_images("tiles/block"),
+                "large_decor": lambda: load_images("tiles/large_decor"),
+                "stone": lambda: load_images("tiles/stone"),
+                "player": lambda: load_image("entities/player.png"),
+                "background": lambda: load_image("background.png"),
+                "stars": lambda: load_image("star.png", 1),
+                "clouds": lambda: load_images("clouds"),
+                "enemy/idle": lambda: Animation(
+                    load_images("entities/enemy/idle"), img_dur=6
+                ),
+                "enemy/run": lambda: Animation(
+                    load_images("entities/enemy/run"), img_dur=4
+                ),
+                "enemy1/idle": lambda: Animation(
+                    load_images("entities/enemy1/idle"), img_dur=6
+                ),
+                "enemy1/run": lambda: Animation(
+                    load_images("entities/enemy1/run"), img_dur=4
+                ),
+                "dragon/idle": lambda: Animation(
+                    load_images("entities/dragon/idle", 1), img_dur=10
+                ),
+                "dragon/run": lambda: Animation(
+                    load_images("entities/dragon/run", 1), img_dur=10
+                ),
+                "dragon/attack": lambda: Animation(
+                    load_images("entities/dragon/attack", 1), img_dur=10, loop=False
+                ),
+                "player/idle": lambda: Animation(
+                    load_images("entities/player/idle"), img_dur=6
+                ),
+                "player/run": lambda: Animation(
+                    load_images("entities/player/run"), img_dur=4
+                ),
+                "player/jump": lambda: Animation(load_images("entities/player/jump")),
+                "player/slide": lambda: Animation(load_images("entities/player/slide")),
+                "player/wall_slide": lambda: Animation(
+                    load_images("entities/player/wall_slide")
+                ),
+                "particle/leaf": lambda: Animation(
+                    load_images("particles/leaf"), img_dur=20, loop=False
+                ),
+                "particle/particle": lambda: Animation(
+                    load_images("particles/particle"), img_dur=6, loop=False
+                ),
+                "gun": lambda: load_image("gun.png"),
+                "projectile": lambda: load_image("projectile.png"),
+                "projectile2": lambda: load_image("projectile5.png", 1),
+                "dust": lambda: load_image("dust1.png", 1, size=(200, 200)),
+                "pieces": lambda: load_images("broken_wall"),
+                "jump_pad_anim": lambda: Animation(
+                    load_images("jump_pad", size=(16, 16)), img_dur=6, loop=False
+                ),
+                "lever": lambda: Animation(
+                    load_images("lever", 1, size=(16, 16)), img_dur=10, loop=False
+                ),
+            }
+        )
 
+        # see AudioManager for which sounds decode when; headless runs are
+        # silent and skip decoding the sound files entirely
         self.sound_factor = 0.5
-        self.sfx["jump"].set_volume(0.7 * self.sound_factor)
-        self.sfx["dash"].set_volume(0.3 * self.sound_factor)
-        self.sfx["hit"].set_volume(0.8 * self.sound_factor)
-        self.sfx["shoot"].set_volume(0.4 * self.sound_factor)
-        self.sfx["ambience"].set_volume(0.2 * self.sound_factor)
-        self.sfx["wall"].set_volume(0.4 * self.sound_factor)
-        self.sfx["jump_pad"].set_volume(0.7 * self.sound_factor)
+        self.audio = AudioManager(
+            SFX,
+            {name: volume * self.sound_factor for name, volume in SFX_VOLUMES.items()},
+            silent=self.headless,
+        )
+        self.sfx = {name: SoundEffect(self.audio, name) for name in SFX}
 
         self.player = Player(self, (50, 50), (8, 15))
-        self.tilemap = Tilemap(self, tile_size=16)
+        # the player outlives every level and holds on to its animation
+        self.assets.pin(name for name in self.assets if name.startswith("player/"))
+        # hitboxes of the player and enemies, rebuilt every frame after they move
+        self.hitboxes = SpatialHash()
+        self.particles = ParticleSystem(self, ["leaf", "particle"])
+        self.sparks = SparkSystem()
+        self.projectiles = Pool(Projectile)
+        self.pieces = Pool(Piece)
+        self.pools = {
+            "projectiles": self.projectiles,
+            "pieces": self.pieces,
+            "particles": self.particles,
+            "sparks": self.sparks,
+        }
 
-        self.level = 0
+        # levels are read on this thread while the transition into them plays;
+        # prepared holds the pending ones and templates the pristine copy of the
+        # one being played, by map id
+        self.level_thread = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="levels"
+        )
+        self.prepared = {}
+        self.templates = {}
+        self.level = level
         self.load_level(LEVELS[self.level])
         self.screenshake = 0
 
-        self.lowest_block_position = self.tilemap.find_lowest_block_position()
         self.gun = False
         self.all_projectiles = []
-        self.pieces = []
+
+    def prepare_level(self, map_id):
+        # start reading map_id on the level thread, for load_level to pick up
+        if map_id not in self.prepared and map_id not in self.templates:
+            self.prepared[map_id] = self.level_thread.submit(
+                PreparedLevel, self, map_id
+            )
 
     def load_level(self, map_id):
+        # the level being played is kept as a template, so restarting it only
+        # copies it; the template of the level left is dropped, sky and all
+        template = self.templates.get(map_id)
+        if template is None:
+            future = self.prepared.pop(map_id, None)
+            if future is not None:
+                template = future.result()
+            else:
+                template = PreparedLevel(self, map_id)
+            self.templates = {map_id: template}
+        level = template.copy()
+
+        self.map_id = map_id
         self.frame = 0
         self.gravity = 0.1
-        self.tilemap.load("data/maps/" + str(map_id) + ".json")
-        ground_tile_positions = []
-        for loc in self.tilemap.tilemap:
-            tile = self.tilemap.tilemap[loc]
-            if tile["type"] in {"grass", "stone", "wall", "block"}:
-                ground_tile_positions.append(
-                    (
-                        tile["pos"][0] * self.tilemap.tile_size,
-                        tile["pos"][1] * self.tilemap.tile_size,
+        self.tilemap = level.tilemap
+        # the player dies this far below the lowest tile of the level
+        self.lowest_block_position = level.lowest_block
+        self.assets.begin_level(map_id, level.assets)
+        # tile_counts is keyed by the tile types the level has
+        self.audio.preload(level.tile_counts)
+
+        # the sky is rolled the first time a level is played and kept with its
+        # template, so restarting a night level doesn't bake the sky again
+        if template.sky is None:
+            self.night = random.randint(0, 1)
+            if self.night:
+                self.stars_pos = []
+                self.starsize = []
+                for i in range(0, 100):
+                    self.starsize.append(random.randint(0, 10))
+                    self.stars_pos.append(
+                        [random.randint(0, 320), random.randint(0, 240)]
                     )
-                )
-
-        self.night = random.randint(0, 1)
-        if self.night:
-            self.stars_pos = []
-            self.starsize = []
-            for i in range(0, 100):
-                self.starsize.append(random.randint(0, 10))
-                self.stars_pos.append([random.randint(0, 320), random.randint(0, 240)])
+                self.bake_night_sky()
+            else:
+                self.night_sky = None
+            template.sky = self.night, self.night_sky
         else:
+            self.night, self.night_sky = template.sky
+        if not self.night:
             self.clouds = Clouds(self.assets["clouds"], count=16)
-        self.leaf_spawners = []
-        for tree in self.tilemap.extract([("large_decor", 2)], keep=True):
-            self.leaf_spawners.append(
-                pygame.Rect(4 + tree["pos"][0], 4 + tree["pos"][1], 23, 13)
-            )
+        self.leaf_spawners = level.leaf_spawners
 
         self.enemies = []
-        for spawner in self.tilemap.extract(
-            [("spawners", 0), ("spawners", 1), ("spawners", 2), ("spawners", 3)]
-        ):
+        for spawner in level.spawners:
             if spawner["variant"] == 0:
                 self.player.pos = spawner["pos"]
                 self.player.air_time = 0
@@ -182,20 +242,19 @@ class Game:
                     Enemy(self, spawner["pos"], (100, 100), 0, 5, "dragon")
                 )
         self.jump_pads = []
-        for jump_pad in self.tilemap.extract([("jump_pad", 0), ("jump_pad", 1)]):
+        for jump_pad in level.jump_pads:
             self.jump_pads.append(
                 JumpPad(self, jump_pad["pos"], self.assets["jump_pad_anim"])
             )
         self.levers = []
-        for lever in self.tilemap.extract([("lever", 0)]):
+        for lever in level.levers:
             self.levers.append(Lever(self, lever["pos"], self.assets["lever"]))
 
         self.gun_pos = self.player.pos
         for _ in range(1000):
-            x, y = random.choice(ground_tile_positions)
-            y -= self.tilemap.tile_size
+            x, y, free = random.choice(level.gun_spots)
             if (
-                not self.tilemap.solid_check((x, y))
+                free
                 and abs(self.player.pos[0] - x) < 200
                 and abs(self.player.pos[1] - y) < 50
             ):
@@ -206,16 +265,17 @@ class Game:
         self.gun_image = self.assets["gun"]
         self.gun_rect = self.gun_image.get_rect(center=self.gun_pos)
 
-        self.projectiles = []
-        self.particles = []
-        self.sparks = []
+        self.projectiles.clear()
+        self.particles.clear()
+        self.sparks.clear()
 
         self.scroll = [0, 0]
+        self.render_scroll = (0, 0)
         self.dead = 0
         self.transition = -30
 
         self.dusts = []
-        if map_id in ["Insane-1", "Insane-2"]:
+        if map_id in DUST_LEVELS:
             for i in range(8):
                 self.dusts.append(
                     Dust(self.assets["dust"], random.randint(-500, -470), i * 100 - 200)
@@ -224,14 +284,37 @@ class Game:
                     Dust(self.assets["dust"], random.randint(-400, -370), i * 100 - 200)
                 )
 
-    def handle_projectiles(self, render_scroll):
-        for projectile in self.projectiles.copy():
+    def bake_night_sky(self):
+        # the stars don't scroll, so the sky is drawn once per level; the later
+        # frames shrink a few stars each to make it twinkle
+        # keyed as the stars always were; SDL blends keyed surfaces differently
+        star = self.assets["stars"].copy()
+        star.set_colorkey((0, 0, 0, 0))
+        twinkle = random.Random(str(self.map_id))
+        self.night_sky = []
+        for i in range(STAR_FRAMES):
+            sky = pygame.Surface(self.display_2.get_size())
+            sky.fill((19, 24, 98, 1))
+            for pos, size in zip(self.stars_pos, self.starsize):
+                if i and twinkle.random() < 0.25:
+                    size = max(size - 2, 0)
+                sky.blit(pygame.transform.smoothscale(star, (size, size)), pos)
+            self.night_sky.append(sky)
+
+    def handle_projectiles(self):
+        for projectile in reversed(self.projectiles):
             projectile.collided = False
-            projectile.update(self.player, self.gravity)
-            projectile.render(self.display, render_scroll)
+            last_pos = (projectile.pos[0], projectile.pos[1])
+            projectile.update(self.hitboxes.rects[self.player], self.gravity)
+
+            # sweep from the last position so fast projectiles can't skip a tile
+            hit = self.tilemap.raycast(last_pos, projectile.pos)
+            if hit is not None:
+                tile_loc, _, hit_pos = hit
+                projectile.pos[0], projectile.pos[1] = hit_pos
 
-            if self.tilemap.wall_check(projectile.pos, projectile.speed):
-                self.sfx["wall"].play()
+            if hit is not None and self.tilemap.tilemap[tile_loc]["type"] == "wall":
+                self.sfx["wall"].play(pos=projectile.pos)
                 projectile.collided = True
                 for _ in range(len(self.assets["pieces"])):
                     pos = [
@@ -239,9 +322,11 @@ class Game:
                         projectile.pos[1] + random.random() * 20 - 10,
                     ]
                     speed = [random.random() * 2 - 1, random.random()]
-                    self.pieces.append(Piece(self.assets["pieces"][0], pos, speed))
+                    self.pieces.spawn(self.assets["pieces"][0], pos, speed)
+                if self.tilemap.damage_wall(tile_loc, projectile.speed):
+                    hit = None
 
-            if self.tilemap.solid_check(projectile.pos):
+            if hit is not None:
                 if projectile.weaponType == 1 or projectile.weaponType == 4:
                     projectile.collided = True
 
@@ -261,7 +346,7 @@ class Game:
                         [-0.5 * speed[0], 0],
                     ]
                     for velocity in spawn_velocities:
-                        new_projectile = Projectile(
+                        self.projectiles.spawn(
                             pos=[
                                 projectile.pos[0] - projectile.speed[0],
                                 projectile.pos[1] - projectile.speed[1],
@@ -272,18 +357,15 @@ class Game:
                             weaponType=2,
                             gravity=self.gravity,
                         )
-                        self.projectiles.append(new_projectile)
 
                 if projectile.collided:
                     for i in range(4):
-                        self.sparks.append(
-                            Spark(
-                                projectile.pos,
-                                random.random()
-                                - 0.5
-                                + (math.pi if projectile.speed[0] > 0 else 0),
-                                2 + random.random(),
-                            )
+                        self.sparks.emit(
+                            projectile.pos,
+                            random.random()
+                            - 0.5
+                            + (math.pi if projectile.speed[0] > 0 else 0),
+                            2 + random.random(),
                         )
 
             elif projectile.time > projectile.maxTime:
@@ -291,7 +373,7 @@ class Game:
 
             elif projectile.entity == 0:
                 if (
-                    self.player.rect().collidepoint(projectile.pos)
+                    self.hitboxes.rects[self.player].collidepoint(projectile.pos)
                     and abs(self.player.dashing) < 50
                 ):
                     projectile.collided = True
@@ -301,10 +383,11 @@ class Game:
                     self.create_particles(self.player)
 
             elif projectile.entity == 1:
-                for enemy in self.enemies.copy():
-                    if enemy.rect().collidepoint(projectile.pos):
+                for enemy in self.hitboxes.query_point(projectile.pos):
+                    # enemies killed earlier this frame are still in the hash
+                    if enemy is not self.player and enemy.health > 0:
                         projectile.collided = True
-                        self.sfx["hit"].play()
+                        self.sfx["hit"].play(pos=projectile.pos)
                         if (
                             enemy.spawn != 1 and enemy.type != "dragon"
                         ) or enemy.headRect().collidepoint(projectile.pos):
@@ -316,69 +399,64 @@ class Game:
             if projectile.collided:
                 self.projectiles.remove(projectile)
 
+    def update_hitboxes(self):
+        self.hitboxes.clear()
+        for enemy in self.enemies:
+            self.hitboxes.insert(enemy, enemy.rect())
+        self.hitboxes.insert(self.player, self.player.rect())
+
+    def handle_dash_hits(self):
+        if abs(self.player.dashing) < 50:
+            return
+        for enemy in self.hitboxes.query_rect(self.hitboxes.rects[self.player]):
+            if enemy is not self.player:
+                enemy.dash_hit()
+                if enemy.health <= 0:
+                    self.enemies.remove(enemy)
+
+    def render_projectiles(self, render_scroll):
+        for projectile in self.projectiles:
+            projectile.render(self.display, render_scroll)
+
     def create_particles(self, entity):
-        self.sfx["hit"].play()
+        self.sfx["hit"].play(pos=entity.rect().center)
         for i in range(30):
             angle = random.random() * math.pi * 2
             speed = random.random() * 5
-            self.sparks.append(
-                Spark(
-                    entity.rect().center,
-                    angle,
-                    2 + random.random(),
-                )
-            )
-            self.particles.append(
-                Particle(
-                    self,
-                    "particle",
-                    entity.rect().center,
-                    velocity=[
-                        math.cos(angle + math.pi) * speed * 0.5,
-                        math.sin(angle + math.pi) * speed * 0.5,
-                    ],
-                    frame=random.randint(0, 7),
-                )
+            self.sparks.emit(entity.rect().center, angle, 2 + random.random())
+            self.particles.emit(
+                "particle",
+                entity.rect().center,
+                velocity=[
+                    math.cos(angle + math.pi) * speed * 0.5,
+                    math.sin(angle + math.pi) * speed * 0.5,
+                ],
+                frame=random.randint(0, 7),
             )
 
-    def handle_particles(self, render_scroll):
+    def handle_particles(self):
         for rect in self.leaf_spawners:
             if random.random() * 49999 < rect.width * rect.height:
                 pos = (
                     rect.x + random.random() * rect.width,
                     rect.y + random.random() * rect.height,
                 )
-                self.particles.append(
-                    Particle(
-                        self,
-                        "leaf",
-                        pos,
-                        velocity=[-0.1, 0.3],
-                        frame=random.randint(0, 20),
-                    )
+                self.particles.emit(
+                    "leaf", pos, velocity=[-0.1, 0.3], frame=random.randint(0, 20)
                 )
 
-        for particle in self.particles.copy():
-            kill = particle.update()
-            particle.render(self.display, offset=render_scroll)
-            if particle.type == "leaf":
-                particle.pos[0] += math.sin(particle.animation.frame * 0.035) * 0.3
-            if kill:
-                self.particles.remove(particle)
+        self.particles.update()
+        self.sparks.update()
 
-        for spark in self.sparks.copy():
-            kill = spark.update()
-            spark.render(self.display, offset=render_scroll)
-            if kill:
-                self.sparks.remove(spark)
+    def render_particles(self, render_scroll):
+        self.particles.render(self.display, offset=render_scroll)
+        self.sparks.render(self.display, offset=render_scroll)
 
     def drawGun(self, render_scroll):
         if self.gun:
             gun_image = self.assets["gun"]
-            gun_image = pygame.transform.scale(
-                gun_image, (gun_image.get_width() * 2, gun_image.get_height() * 2)
-            )
-            gun_rect = gun_image.get_rect()
+            gun_size = (gun_image.get_width() * 2, gun_image.get_height() * 2)
+            gun_rect = pygame.Rect((0, 0), gun_size)
             square_size = max(gun_rect.width, gun_rect.height)
             square_surface = pygame.Surface(
                 (square_size + 5, square_size + 5), pygame.SRCALPHA
@@ -404,32 +482,16 @@ class Game:
             square_rect3 = square_surface3.get_rect(topleft=(50, 10))
 
             gun_rect.topleft = [12, 15]
-            gun_img = gun_image.copy()
+            gun_img = sprite_cache.get(gun_image, size=gun_size)
             self.display.blit(square_surface1, square_rect1)
             self.display.blit(gun_img, gun_rect)
 
-            gun_img = gun_image.copy()
-            gun_img.fill(
-                (
-                    0,
-                    255,
-                    0,
-                ),
-                special_flags=pygame.BLEND_RGB_MULT,
-            )
+            gun_img = sprite_cache.get(gun_image, size=gun_size, tint=(0, 255, 0))
             gun_rect.topleft = [32, 15]
             self.display.blit(square_surface2, square_rect2)
             self.display.blit(gun_img, gun_rect)
 
-            gun_img = gun_image.copy()
-            gun_img.fill(
-                (
-                    255,
-                    0,
-                    0,
-                ),
-                special_flags=pygame.BLEND_RGB_MULT,
-            )
+            gun_img = sprite_cache.get(gun_image, size=gun_size, tint=(255, 0, 0))
             gun_rect.topleft = [52, 15]
             self.display.blit(square_surface3, square_rect3)
             self.display.blit(gun_img, gun_rect)
@@ -443,175 +505,314 @@ class Game:
                 ),
             )
 
-    def run(self):
-        pygame.mixer.music.load("data/music.wav")
-        pygame.mixer.music.set_volume(0.5 * self.sound_factor)
-        pygame.mixer.music.play(-1)
-
-        self.sfx["ambience"].play(-1)
-
-        while True:
-            self.frame += 1
-            self.display.fill((0, 0, 0, 0))
-            self.display_2.fill((19, 24, 98, 1))
-            self.screenshake = max(0, self.screenshake - 1)
-
-            for enemy in self.enemies:
-                if enemy.spawn == 1 and random.random() < 0.001:
-                    self.enemies.append(Enemy(self, enemy.pos, (8, 15), 0, 1, "enemy"))
-
-            if not len(self.enemies):
-                self.transition += 1
-                if self.transition > 30:
-                    self.level = min(self.level + 1, len(os.listdir("data/maps")) - 1)
-                    self.load_level(LEVELS[self.level])
-            if self.transition < 0:
-                self.transition += 1
-
-            if self.dead:
-                self.dead += 1
-                if self.dead == 10:
-                    self.transition = min(30, self.transition + 1)
-                if self.dead > 40:
-                    self.load_level(LEVELS[self.level])
-                    self.gun = False
-
-            self.scroll[0] += (
-                self.player.rect().centerx
-                - self.display.get_width() / 2
-                - self.scroll[0]
-            ) / 30
-            self.scroll[1] += (
-                self.player.rect().centery
-                - self.display.get_height() / 2
-                - self.scroll[1]
-            ) / 30
-            render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
-
-            if self.night:
-                for i in range(0, len(self.stars_pos)):
-                    img = pygame.image.load("data/images/star.png")
-                    img.set_colorkey((0, 0, 0, 0))
-                    self.display_2.blit(
-                        pygame.transform.smoothscale(
-                            img, (self.starsize[i], self.starsize[i])
-                        ),
-                        self.stars_pos[i],
-                    )
-            else:
-                self.display_2.blit(self.assets["background"], (0, 0))
-                self.clouds.update()
-                self.clouds.render(self.display_2, offset=render_scroll)
-
-            self.tilemap.render(self.display, offset=render_scroll)
-
-            for enemy in self.enemies.copy():
-                kill = enemy.update(self.tilemap, (0, 0), self.gravity)
-                enemy.render(self.display, offset=render_scroll)
-                if kill:
-                    self.enemies.remove(enemy)
-
-            for jump_pad in self.jump_pads:
-                if jump_pad.update(self.player.rect()):
-                    self.player.jump(-5)
-                    self.sfx["jump_pad"].play()
-                jump_pad.render(self.display, render_scroll)
-
-            for lever in self.levers:
-                if lever.update(self.player.rect()):
-                    self.gravity = -self.gravity
-                lever.render(self.display, render_scroll)
-
-            self.tilemap.block_check(self.player)
-
-            if not self.dead:
-                self.player.update(
-                    self.tilemap, (self.movement[1] - self.movement[0], 0), self.gravity
-                )
-                self.player.render(self.display, offset=render_scroll)
-
-            self.handle_projectiles(render_scroll)
-            self.handle_particles(render_scroll)
-            self.drawGun(render_scroll)
-
-            for piece in self.pieces:
-                piece.update()
-                piece.render(self.display, offset=render_scroll)
-                if piece.pos[1] > self.player.pos[1] + 1000:
-                    self.pieces.remove(piece)
-
-            for dust in self.dusts:
-                dust.update(self.frame, self.player)
-            for dust in self.dusts:
-                dust.render(self.display, offset=render_scroll)
-
-            for dust in self.dusts:
-                if self.player.rect().colliderect(
-                    dust.x,
-                    dust.y,
-                    dust.image.get_width(),
-                    dust.image.get_height(),
-                ):
-                    self.dead += 1
+    def run(self, frames=None):
+        if not self.headless:
+            # the mixer streams music from the file, decoding as it plays
+            pygame.mixer.music.load(audio_path(MUSIC))
+            pygame.mixer.music.set_volume(0.5 * self.sound_factor)
+            pygame.mixer.music.play(-1)
+
+            self.sfx["ambience"].play(-1)
+
+        frame_count = 0
+        while frames is None or frame_count < frames:
+            self.step()
+            frame_count += 1
+        self.profiler.close()
+
+    def handle_event(self, event):
+        if event.type == pygame.QUIT:
+            self.profiler.close()
+            pygame.quit()
+            sys.exit()
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_LEFT:
+                self.movement[0] = True
+            if event.key == pygame.K_RIGHT:
+                self.movement[1] = True
+            if event.key == pygame.K_UP:
+                if self.player.jump():
+                    self.sfx["jump"].play()
+            if event.key == pygame.K_x:
+                self.player.dash()
+            if event.key == pygame.K_z and self.gun:
+                self.player.shoot = True
+            if event.key == pygame.K_c and self.gun:
+                self.player.weaponType += 1
+                if self.player.weaponType > 3:
+                    self.player.weaponType = 1
+            if event.key == pygame.K_F3:
+                self.profiler.toggle_overlay()
+            if event.key == pygame.K_F4:
+                self.sparks.exact = not self.sparks.exact
+
+        if event.type == pygame.KEYUP:
+            if event.key == pygame.K_LEFT:
+                self.movement[0] = False
+            if event.key == pygame.K_RIGHT:
+                self.movement[1] = False
+
+    def step(self):
+        self.profiler.begin_frame()
+        self.audio.new_frame()
+        for event in pygame.event.get():
+            self.handle_event(event)
+        self.profiler.lap("events")
+
+        self.update()
+        self.render()
+        self.profiler.end_frame(self.frame, self.map_id)
+
+        if not self.headless:
+            self.clock.tick(60)
 
-            display_mask = pygame.mask.from_surface(self.display)
-            display_silhouette = display_mask.to_surface(
-                setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)
+    def update(self):
+        self.frame += 1
+        self.screenshake = max(0, self.screenshake - 1)
+
+        for enemy in self.enemies:
+            if enemy.spawn == 1 and random.random() < 0.001:
+                self.enemies.append(Enemy(self, enemy.pos, (8, 15), 0, 1, "enemy"))
+
+        if not len(self.enemies):
+            next_level = min(self.level + 1, len(LEVELS) - 1)
+            # read the next level while the transition plays
+            self.prepare_level(LEVELS[next_level])
+            self.transition += 1
+            if self.transition > 30:
+                self.level = next_level
+                self.load_level(LEVELS[self.level])
+        if self.transition < 0:
+            self.transition += 1
+
+        if self.dead:
+            self.dead += 1
+            if self.dead == 10:
+                self.transition = min(30, self.transition + 1)
+            if self.dead > 40:
+                self.load_level(self.map_id)
+                self.gun = False
+
+        self.scroll[0] += (
+            self.player.rect().centerx - self.display.get_width() / 2 - self.scroll[0]
+        ) / 30
+        self.scroll[1] += (
+            self.player.rect().centery - self.display.get_height() / 2 - self.scroll[1]
+        ) / 30
+        self.render_scroll = (int(self.scroll[0]), int(self.scroll[1]))
+        self.audio.camera = pygame.Rect(self.render_scroll, self.display.get_size())
+
+        if not self.night:
+            self.clouds.update()
+        self.profiler.lap("state")
+
+        for enemy in self.enemies.copy():
+            kill = enemy.update(self.tilemap, (0, 0), self.gravity)
+            if kill:
+                self.enemies.remove(enemy)
+        self.profiler.lap("enemies")
+
+        for jump_pad in self.jump_pads:
+            if jump_pad.update(self.player.rect()):
+                self.player.jump(-5)
+                self.sfx["jump_pad"].play()
+
+        for lever in self.levers:
+            if lever.update(self.player.rect()):
+                self.gravity = -self.gravity
+        self.profiler.lap("pads_levers")
+
+        self.tilemap.update_effects()
+        self.tilemap.block_check(self.player)
+        self.profiler.lap("block_check")
+
+        if not self.dead:
+            self.player.update(
+                self.tilemap, (self.movement[1] - self.movement[0], 0), self.gravity
             )
-            for offset in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                self.display_2.blit(display_silhouette, offset)
-
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-                if event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_LEFT:
-                        self.movement[0] = True
-                    if event.key == pygame.K_RIGHT:
-                        self.movement[1] = True
-                    if event.key == pygame.K_UP:
-                        if self.player.jump():
-                            self.sfx["jump"].play()
-                    if event.key == pygame.K_x:
-                        self.player.dash()
-                    if event.key == pygame.K_z and self.gun:
-                        self.player.shoot = True
-                    if event.key == pygame.K_c and self.gun:
-                        self.player.weaponType += 1
-                        if self.player.weaponType > 3:
-                            self.player.weaponType = 1
-
-                if event.type == pygame.KEYUP:
-                    if event.key == pygame.K_LEFT:
-                        self.movement[0] = False
-                    if event.key == pygame.K_RIGHT:
-                        self.movement[1] = False
-
-            if self.transition:
-                transition_surf = pygame.Surface(self.display.get_size())
-                pygame.draw.circle(
-                    transition_surf,
-                    (255, 255, 255),
-                    (self.display.get_width() // 2, self.display.get_height() // 2),
-                    (30 - abs(self.transition)) * 8,
-                )
-                transition_surf.set_colorkey((255, 255, 255))
-                self.display.blit(transition_surf, (0, 0))
+        self.profiler.lap("player")
+
+        self.update_hitboxes()
+        self.handle_dash_hits()
+        self.profiler.lap("hitboxes")
+
+        self.handle_projectiles()
+        self.profiler.lap("projectiles")
+        self.handle_particles()
+        self.profiler.lap("particles")
+
+        for piece in reversed(self.pieces):
+            piece.update()
+            if piece.pos[1] > self.player.pos[1] + 1000:
+                self.pieces.remove(piece)
+
+        for dust in self.dusts:
+            dust.update(self.frame, self.player)
+
+        for dust in self.dusts:
+            if self.player.rect().colliderect(
+                dust.x,
+                dust.y,
+                dust.image.get_width(),
+                dust.image.get_height(),
+            ):
+                self.dead += 1
+        self.profiler.lap("pieces_dust")
 
-            self.display_2.blit(self.display, (0, 0))
+    def render(self):
+        render_scroll = self.render_scroll
+        self.display.fill((0, 0, 0, 0))
+        self.display_2.fill((19, 24, 98, 1))
 
-            screenshake_offset = (
-                random.random() * self.screenshake - self.screenshake / 2,
-                random.random() * self.screenshake - self.screenshake / 2,
-            )
-            self.screen.blit(
-                pygame.transform.smoothscale(self.display_2, self.screen.get_size()),
-                screenshake_offset,
+        sky_frame = None
+        cloud_rects = []
+        if self.night:
+            sky_frame = self.frame // STAR_FRAME_TIME % STAR_FRAMES
+            self.display_2.blit(self.night_sky[sky_frame], (0, 0))
+        else:
+            self.display_2.blit(self.assets["background"], (0, 0))
+            cloud_rects = self.clouds.render(self.display_2, offset=render_scroll)
+        self.profiler.lap("background")
+
+        baked = self.tilemap.render_chunks(self.display, offset=render_scroll)
+        self.display.rects.clear()
+        self.display.track = self.dirty_rects
+        self.tilemap.render_dynamic(self.display, offset=render_scroll)
+        self.profiler.lap("tilemap")
+
+        for enemy in self.enemies:
+            enemy.render(self.display, offset=render_scroll)
+
+        for jump_pad in self.jump_pads:
+            jump_pad.render(self.display, render_scroll)
+
+        for lever in self.levers:
+            lever.render(self.display, render_scroll)
+
+        if not self.dead:
+            self.player.render(self.display, offset=render_scroll)
+        self.profiler.lap("draw_entities")
+
+        self.render_projectiles(render_scroll)
+        self.profiler.lap("draw_projectiles")
+        self.render_particles(render_scroll)
+        self.profiler.lap("draw_particles")
+        self.drawGun(render_scroll)
+        self.profiler.lap("gun")
+
+        for piece in self.pieces:
+            piece.render(self.display, offset=render_scroll)
+
+        for dust in self.dusts:
+            dust.render(self.display, offset=render_scroll)
+        self.display.track = False
+        self.profiler.lap("draw_pieces_dust")
+
+        self.display.render_outline(self.display_2)
+        self.profiler.lap("silhouette")
+
+        if self.transition:
+            transition_surf = pygame.Surface(self.display.get_size())
+            pygame.draw.circle(
+                transition_surf,
+                (255, 255, 255),
+                (self.display.get_width() // 2, self.display.get_height() // 2),
+                (30 - abs(self.transition)) * 8,
             )
-
+            transition_surf.set_colorkey((255, 255, 255))
+            self.display.blit(transition_surf, (0, 0))
+
+        self.display_2.blit(self.display, (0, 0))
+
+        # in display pixels; the shake strength was tuned on the 2x window
+        screenshake_offset = (
+            (random.random() * self.screenshake - self.screenshake / 2) / 2,
+            (random.random() * self.screenshake - self.screenshake / 2) / 2,
+        )
+        self.presenter.present(self.display_2, screenshake_offset)
+        self.profiler.lap("present")
+
+        self.profiler.render(self.screen)
+        view = (render_scroll, screenshake_offset, self.transition, sky_frame)
+        self.update_window(
+            view, self.display.rects + cloud_rects, baked or self.profiler.overlay
+        )
+        self.profiler.lap("flip")
+
+    def update_window(self, view, rects, redraw_all=False):
+        # rects are the display areas drawn this frame; together with last
+        # frame's they cover every pixel that can have changed, as long as the
+        # view (scroll, shake, transition, sky) is the same as last frame
+        if not self.dirty_rects or redraw_all or view != self.last_view:
             pygame.display.update()
-            self.clock.tick(60)
-
-
-Game().run()
+        else:
+            pygame.display.update(
+                [self.presenter.window_rect(rect) for rect in rects + self.last_rects]
+            )
+        self.last_view = view
+        self.last_rects = rects
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ninja game")
+    parser.add_argument(
+        "--headless",
+        action="store_true",
+        help="run without a window or audio and without the 60 fps cap",
+    )
+    parser.add_argument(
+        "--frames", type=int, help="stop after simulating this many frames"
+    )
+    parser.add_argument("--level", default=LEVELS[0], choices=LEVELS)
+    parser.add_argument("--seed", type=int, help="seed the random module")
+    parser.add_argument(
+        "--profile-out",
+        help="stream per-phase frame timings to a .csv or .jsonl file",
+    )
+    parser.add_argument(
+        "--overlay",
+        action="store_true",
+        help="show the frame timing overlay (toggle in game with F3)",
+    )
+    parser.add_argument(
+        "--scale-mode",
+        default="smooth",
+        choices=SCALE_MODES,
+        help="how the 320x240 frame is scaled to the window",
+    )
+    parser.add_argument(
+        "--window",
+        default="640x480",
+        type=parse_window_size,
+        help="window size as WIDTHxHEIGHT (ignored by --scale-mode scaled)",
+    )
+    parser.add_argument(
+        "--dirty-rects",
+        action="store_true",
+        help="only update the changed parts of the window while the camera is still",
+    )
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    game = Game(
+        headless=args.headless,
+        level=LEVELS.index(args.level),
+        profiler=FrameProfiler(args.profile_out, overlay=args.overlay),
+        scale_mode=args.scale_mode,
+        window_size=args.window,
+        dirty_rects=args.dirty_rects,
+    )
+    start = time.perf_counter()
+    game.run(frames=args.frames)
+    elapsed = time.perf_counter() - start
+    if args.frames:
+        print(
+            f"{args.frames} frames in {elapsed:.2f}s "
+            f"({args.frames / elapsed:.0f} fps)"
+        )
+
+
+if __name__ == "__main__":
+    main()
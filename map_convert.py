@@ -0,0 +1,71 @@
+import os
+import json
+import argparse
+
+from scripts.map_format import MAP_EXT, encode_map, read_map
+
+MAP_DIRS = ["data/maps", "data/final maps", "data/extra_maps"]
+
+
+def default_paths():
+    paths = []
+    for map_dir in MAP_DIRS:
+        for filename in sorted(os.listdir(map_dir)):
+            if filename.endswith(".json"):
+                paths.append(os.path.join(map_dir, filename))
+    return paths
+
+
+def to_binary(path, out):
+    with open(path, "r") as f:
+        map_data = json.load(f)
+    data = encode_map(map_data)
+    with open(out, "wb") as f:
+        f.write(data)
+    # refuse to keep a copy that doesn't read back as the same JSON, e.g. a
+    # position outside the record's range or a key that doesn't match its pos
+    if json.dumps(read_map(out)) != json.dumps(map_data):
+        os.remove(out)
+        raise ValueError(f"{path} can't be stored losslessly as a binary map")
+    return data
+
+
+def to_json(path, out):
+    # written the way Tilemap.save writes maps
+    with open(out, "w") as f:
+        json.dump(read_map(path), f)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="convert maps between JSON and the binary map format; "
+        f".json files become {MAP_EXT} files next to them and the other way round"
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        help="maps to convert (default: every JSON map in " + ", ".join(MAP_DIRS) + ")",
+    )
+    parser.add_argument(
+        "--out", help="output path, when converting a single map somewhere else"
+    )
+    args = parser.parse_args()
+
+    paths = args.paths or default_paths()
+    if args.out and len(paths) != 1:
+        parser.error("--out needs exactly one map")
+
+    for path in paths:
+        if path.endswith(MAP_EXT):
+            out = args.out or os.path.splitext(path)[0] + ".json"
+            to_json(path, out)
+        else:
+            out = args.out or os.path.splitext(path)[0] + MAP_EXT
+            to_binary(path, out)
+        print(
+            f"{path} ({os.path.getsize(path)} bytes) -> {out} ({os.path.getsize(out)} bytes)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import os
+import json
+import mmap
+import struct
+
+import pygame
+
+PACK_PATH = "data/images.pack"
+MAGIC = b"NINJAPK1"
+# magic, then the length of the json index that follows it
+HEADER = struct.Struct("<8sI")
+# bytes per pixel of a page, by conversion (0: colorkeyed RGB, 1: RGBA)
+PAGE_FORMATS = {0: ("RGB", 3), 1: ("RGBA", 4)}
+
+
+def image_key(path, conversion=0, size=None):
+    key = f"{path}:{conversion}"
+    if size is not None:
+        key += f":{size[0]}x{size[1]}"
+    return key
+
+
+def newest_mtime(image_dir):
+    newest = 0
+    for root, dirs, files in os.walk(image_dir):
+        for name in files:
+            newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+    return newest
+
+
+class AssetPack:
+    # atlas pages baked by bake_assets.py. The file is a header, a json index
+    # and the raw pixels of every page, so loading it is a memory map instead
+    # of a PNG decode per image. The pages stay in the mapping; every image is
+    # converted out of its page on its own, so it owns its pixels and dropping
+    # it frees them.
+    def __init__(self, path, use_mmap=True):
+        with open(path, "rb") as f:
+            if use_mmap:
+                self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.data = f.read()
+        view = memoryview(self.data)
+        magic, index_size = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an asset pack")
+        index = json.loads(bytes(view[HEADER.size : HEADER.size + index_size]))
+
+        # surfaces straight on top of the mapped pixels; nothing is copied
+        # until an image is cut out of one
+        self.pages = []
+        start = HEADER.size + index_size
+        for offset, width, height, conversion in index["pages"]:
+            fmt, depth = PAGE_FORMATS[conversion]
+            offset += start
+            pixels = view[offset : offset + width * height * depth]
+            self.pages.append(pygame.image.frombuffer(pixels, (width, height), fmt))
+        self.images = index["images"]
+
+    @classmethod
+    def open(cls, path=PACK_PATH, image_dir=None, use_mmap=True):
+        # None when there is no pack, or when an image changed after the bake
+        if not os.path.exists(path):
+            return None
+        if image_dir is not None:
+            if newest_mtime(image_dir) > os.stat(path).st_mtime:
+                return None
+        return cls(path, use_mmap)
+
+    def get(self, path, conversion=0, size=None):
+        # the frames stored for a file or directory, or None if it wasn't baked
+        frames = self.images.get(image_key(path, conversion, size))
+        if frames is None:
+            return None
+        images = []
+        for page, x, y, width, height in frames:
+            img = self.pages[page].subsurface((x, y, width, height))
+            if conversion == 0:
+                img = img.convert()
+                img.set_colorkey((0, 0, 0, 0))
+            else:
+                img = img.convert_alpha()
+            images.append(img)
+        return images
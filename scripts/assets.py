@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.utils import Animation
+from scripts.sprite_cache import sprite_cache, surface_bytes
+
+
+def asset_images(asset):
+    # the surfaces of an image, a list of them or an animation
+    if isinstance(asset, Animation):
+        asset = asset.images
+    if isinstance(asset, list):
+        return [img for item in asset for img in asset_images(item)]
+    return [asset]
+
+
+def asset_bytes(asset):
+    # nominal pixel memory of an asset
+    return sum(surface_bytes(img) for img in asset_images(asset))
+
+
+class AssetRegistry:
+    # game.assets: every entry has a loader and is loaded the first time it is
+    # looked up, or ahead of time on a background thread when a level that
+    # uses it starts. Entries the last keep_levels levels didn't use are dropped
+    # again, least recently used first, while the loaded ones take more than
+    # budget bytes. Pinned entries are never dropped: whatever keeps hold of
+    # them would keep their images alive, and the next lookup would load them
+    # a second time.
+    def __init__(self, loaders, budget=2 << 20, keep_levels=2):
+        self.loaders = dict(loaders)
+        self.budget = budget
+        self.keep_levels = keep_levels
+        self.loaded = {}
+        self.pending = {}
+        self.sizes = {}
+        self.bytes = 0
+        # the level generation each entry was last looked up in
+        self.last_used = {}
+        self.pinned = set()
+        self.generation = 0
+        self.level_id = None
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="assets")
+        self.reset_stats()
+
+    def reset_stats(self):
+        # loads: loaded on the main thread on first use; prefetches: loaded in
+        # the background; waits: looked up while the background load was running
+        self.loads = 0
+        self.prefetches = 0
+        self.waits = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            "loaded": len(self.loaded),
+            "bytes": self.bytes,
+            "loads": self.loads,
+            "prefetches": self.prefetches,
+            "waits": self.waits,
+            "evictions": self.evictions,
+        }
+
+    def __contains__(self, name):
+        return name in self.loaders
+
+    def __iter__(self):
+        return iter(self.loaders)
+
+    def __getitem__(self, name):
+        asset = self.loaded.get(name)
+        if asset is None:
+            asset = self.load(name)
+        self.last_used[name] = self.generation
+        return asset
+
+    def load(self, name):
+        future = self.pending.pop(name, None)
+        if future is not None:
+            if not future.done():
+                self.waits += 1
+            asset = future.result()
+            self.prefetches += 1
+        else:
+            asset = self.loaders[name]()
+            self.loads += 1
+        self.loaded[name] = asset
+        self.sizes[name] = asset_bytes(asset)
+        self.bytes += self.sizes[name]
+        return asset
+
+    def pin(self, names):
+        self.pinned.update(names)
+
+    def collect(self):
+        # move finished background loads over, so they count towards the budget
+        for name, future in list(self.pending.items()):
+            if future.done():
+                self.load(name)
+
+    def prefetch(self, names):
+        for name in names:
+            if name not in self.loaded and name not in self.pending:
+                self.pending[name] = self.executor.submit(self.loaders[name])
+
+    def begin_level(self, level_id, names):
+        self.collect()
+        # restarting the same level doesn't age anything
+        if level_id != self.level_id:
+            self.level_id = level_id
+            self.generation += 1
+        names = [name for name in names if name in self.loaders]
+        for name in names:
+            self.last_used[name] = self.generation
+        self.prefetch(names)
+        self.evict()
+
+    def evict(self):
+        stale = sorted(
+            (self.last_used.get(name, 0), name)
+            for name in self.loaded
+            if name not in self.pinned
+            and self.last_used.get(name, 0) <= self.generation - self.keep_levels
+        )
+        for last_used, name in stale:
+            if self.bytes <= self.budget:
+                break
+            # the transformed copies would keep the images alive otherwise
+            sprite_cache.discard(asset_images(self.loaded.pop(name)))
+            self.bytes -= self.sizes.pop(name)
+            self.evictions += 1
@@ -0,0 +1,311 @@
+import io
+import os
+import wave
+
+import pygame
+
+SFX = {
+    "jump": "data/sfx/jump.wav",
+    "dash": "data/sfx/dash.wav",
+    "hit": "data/sfx/hit.wav",
+    "shoot": "data/sfx/shoot.wav",
+    "ambience": "data/sfx/ambience.wav",
+    "wall": "data/sfx/break5.wav",
+    "jump_pad": "data/sfx/jump_pad.mp3",
+}
+SFX_VOLUMES = {
+    "jump": 0.7,
+    "dash": 0.3,
+    "hit": 0.8,
+    "shoot": 0.4,
+    "ambience": 0.2,
+    "wall": 0.4,
+    "jump_pad": 0.7,
+}
+MUSIC = "data/music.wav"
+
+# how many copies of each sound can play at once
+VOICES = {
+    "jump": 1,
+    "dash": 1,
+    "hit": 2,
+    "shoot": 3,
+    "ambience": 1,
+    "wall": 2,
+    "jump_pad": 1,
+}
+# sounds from sources up to this far outside the camera fade out with distance;
+# further ones aren't played at all
+HEARING_MARGIN = 160
+
+# effects only some levels use, decoded when a level with them loads or when
+# they first play rather than at startup
+LAZY = {"wall", "jump_pad"}
+# the sounds each tile type can make, for preloading the ones a level needs
+TILE_SOUNDS = {
+    "wall": ("wall",),
+    "jump_pad": ("jump_pad",),
+}
+# long looping sounds, read from their WAV file a chunk at a time while they
+# play instead of decoded whole
+STREAMED = {"ambience"}
+STREAM_CHUNK_TIME = 1.0
+
+COMPRESSED_EXT = ".ogg"
+
+
+def audio_path(path):
+    # the copy transcode_audio.py made of a sound, unless the original changed
+    # since; the copy alone will do too
+    compressed = os.path.splitext(path)[0] + COMPRESSED_EXT
+    try:
+        compressed_time = os.stat(compressed).st_mtime
+    except FileNotFoundError:
+        return path
+    try:
+        if os.stat(path).st_mtime > compressed_time:
+            return path
+    except FileNotFoundError:
+        pass
+    return compressed
+
+
+class WavStream:
+    # a sound queued on its channel chunk_time seconds at a time, straight from
+    # its WAV file, so only about two chunks of it are ever decoded
+    def __init__(self, path, channel, volume, loops=0, chunk_time=STREAM_CHUNK_TIME):
+        self.file = wave.open(path, "rb")
+        self.params = self.file.getparams()
+        self.chunk_frames = max(1, int(self.params.framerate * chunk_time))
+        self.channel = channel
+        self.volume = volume
+        self.loops = loops
+        self.done = False
+
+    def next_chunk(self):
+        data = self.file.readframes(self.chunk_frames)
+        if not data and self.loops:
+            if self.loops > 0:
+                self.loops -= 1
+            self.file.rewind()
+            data = self.file.readframes(self.chunk_frames)
+        if not data:
+            return None
+        # wrapped up as a WAV again so the mixer converts it to its own format
+        buf = io.BytesIO()
+        out = wave.open(buf, "wb")
+        out.setparams(self.params)
+        out.writeframes(data)
+        out.close()
+        buf.seek(0)
+        chunk = pygame.mixer.Sound(file=buf)
+        chunk.set_volume(self.volume)
+        return chunk
+
+    def update(self):
+        # keep the next chunk queued behind the one playing
+        if self.done:
+            return
+        busy = self.channel.get_busy()
+        if busy and self.channel.get_queue() is not None:
+            return
+        chunk = self.next_chunk()
+        if chunk is None:
+            self.close()
+        elif busy:
+            self.channel.queue(chunk)
+        else:
+            self.channel.play(chunk)
+
+    def close(self):
+        self.done = True
+        self.file.close()
+
+    def stop(self):
+        self.channel.stop()
+        self.close()
+
+
+class SoundEffect:
+    # an entry of Game.sfx; plays its sound through the manager, so the voice
+    # budget, the per-frame dedupe and the distance fade apply to it
+    def __init__(self, audio, name):
+        self.audio = audio
+        self.name = name
+
+    def play(self, loops=0, pos=None):
+        return self.audio.play(self.name, pos, loops)
+
+
+class AudioManager:
+    # plays the sound effects on mixer channels reserved per sound, so a burst
+    # of one sound can't take the channels the others need. A sound played
+    # several times in a frame only starts once, and a sound out of voices cuts
+    # off its oldest copy instead of queueing for a free channel.
+    #
+    # Sounds are decoded at startup, except the LAZY ones, which wait for
+    # preload() or their first play, and the STREAMED ones. Silent managers
+    # (headless runs) don't decode anything and don't stream.
+    def __init__(
+        self,
+        paths,
+        volumes,
+        silent=False,
+        voices=VOICES,
+        margin=HEARING_MARGIN,
+    ):
+        self.paths = paths
+        self.volumes = volumes
+        self.silent = silent
+        self.margin = margin
+        self.sounds = {}
+        self.streams = {}
+        reserved = sum(voices.get(name, 1) for name in paths)
+        pygame.mixer.set_num_channels(reserved)
+        pygame.mixer.set_reserved(reserved)
+        # each sound's channels, the one that started playing longest ago first
+        self.channels = {}
+        index = 0
+        for name in paths:
+            count = voices.get(name, 1)
+            self.channels[name] = [
+                pygame.mixer.Channel(index + i) for i in range(count)
+            ]
+            index += count
+        # the view sounds with a position are heard from, in world pixels
+        self.camera = None
+        # the channel and volume of each sound started this frame
+        self.playing = {}
+        self.reset_stats()
+        for name in paths:
+            if name not in LAZY and name not in STREAMED:
+                self.load(name)
+
+    def reset_stats(self):
+        # deduped: played again in the same frame; culled: too far off camera;
+        # stolen: cut off an older copy of itself; lazy_loads: decoded after
+        # startup
+        self.played = 0
+        self.lazy_loads = 0
+        self.deduped = 0
+        self.culled = 0
+        self.stolen = 0
+        self.busy_peak = 0
+
+    def stats(self):
+        return {
+            "channels": pygame.mixer.get_num_channels(),
+            "busy": self.busy(),
+            "busy_peak": self.busy_peak,
+            "played": self.played,
+            "deduped": self.deduped,
+            "culled": self.culled,
+            "stolen": self.stolen,
+            "decoded": len(self.sounds),
+            "decoded_bytes": self.decoded_bytes(),
+            "lazy_loads": self.lazy_loads,
+            "streams": len(self.streams),
+        }
+
+    def decoded_bytes(self):
+        frequency, size, channels = pygame.mixer.get_init()
+        sample_bytes = abs(size) // 8 * channels
+        return sum(
+            int(sound.get_length() * frequency) * sample_bytes
+            for sound in self.sounds.values()
+        )
+
+    def load(self, name):
+        sound = self.sounds.get(name)
+        if sound is None:
+            if self.silent:
+                sound = pygame.mixer.Sound(buffer=bytes(4))
+            else:
+                sound = pygame.mixer.Sound(audio_path(self.paths[name]))
+            sound.set_volume(self.volumes.get(name, 1))
+            self.sounds[name] = sound
+            if name in LAZY:
+                self.lazy_loads += 1
+        return sound
+
+    def preload(self, tile_types):
+        # decode the lazy sounds the tiles of these types make, so they don't
+        # stall their first play
+        for tile_type in tile_types:
+            for name in TILE_SOUNDS.get(tile_type, ()):
+                if name in LAZY:
+                    self.load(name)
+
+    def stream(self, name, loops=0):
+        if self.silent:
+            return None
+        if name in self.streams:
+            self.streams.pop(name).stop()
+        channel = self.channels[name][0]
+        try:
+            stream = WavStream(
+                self.paths[name], channel, self.volumes.get(name, 1), loops
+            )
+        except wave.Error:
+            # not plain PCM, so it can't be read in chunks; decode it whole
+            channel.play(self.load(name), loops)
+            return channel
+        self.streams[name] = stream
+        stream.update()
+        return channel
+
+    def busy(self):
+        return sum(
+            channel.get_busy()
+            for channels in self.channels.values()
+            for channel in channels
+        )
+
+    def new_frame(self):
+        # call before anything plays in a frame, input handling included
+        for name, stream in list(self.streams.items()):
+            stream.update()
+            if stream.done:
+                del self.streams[name]
+        self.busy_peak = max(self.busy_peak, self.busy())
+        self.playing.clear()
+
+    def audibility(self, pos):
+        # 1 on camera, fading to 0 at margin pixels outside it
+        if self.camera is None:
+            return 1
+        dx = max(self.camera.left - pos[0], pos[0] - self.camera.right, 0)
+        dy = max(self.camera.top - pos[1], pos[1] - self.camera.bottom, 0)
+        return 1 - max(dx, dy) / self.margin
+
+    def play(self, name, pos=None, loops=0):
+        # pos is where in the world the sound comes from; sounds without one
+        # (the player's) are always heard at full volume
+        if name in STREAMED:
+            return self.stream(name, loops)
+        volume = 1 if pos is None else self.audibility(pos)
+        if volume <= 0:
+            self.culled += 1
+            return None
+
+        if name in self.playing:
+            channel, played_volume = self.playing[name]
+            self.deduped += 1
+            if volume > played_volume:
+                channel.set_volume(volume)
+                self.playing[name] = (channel, volume)
+            return channel
+
+        channels = self.channels[name]
+        channel = next((c for c in channels if not c.get_busy()), None)
+        if channel is None:
+            channel = channels[0]
+            self.stolen += 1
+        channels.remove(channel)
+        channels.append(channel)
+
+        channel.play(self.load(name), loops)
+        channel.set_volume(volume)
+        self.playing[name] = (channel, volume)
+        self.played += 1
+        return channel
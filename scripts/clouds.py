@@ -16,7 +16,7 @@ class Cloud:
             self.pos[0] - offset[0] * self.depth,
             self.pos[1] - offset[1] * self.depth,
         )
-        surf.blit(
+        return surf.blit(
             self.img,
             (
                 render_pos[0] % (surf.get_width() + self.img.get_width())
@@ -40,7 +40,7 @@ class Clouds:
             cloud.update()
     
     def render(self, surf, offset=(0, 0)):
-        for cloud in self.clouds:
-            cloud.render(surf, offset=offset)
+        # returns the rects the clouds were drawn to
+        return [cloud.render(surf, offset=offset) for cloud in self.clouds]
             
 
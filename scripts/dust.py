@@ -1,4 +1,3 @@
-import pygame
 import random
 import math
 
@@ -18,8 +17,8 @@ class Dust:
         self.amplitude = random.randint(5, 20)
         self.frequency = random.uniform(0.002, 0.01)
         self.offset = random.uniform(0, 2 * math.pi)
+        # the game loads the dust image at its 200x200 size
         self.image = image
-        self.image = pygame.transform.scale(self.image, (200, 200))
 
     def update(self, frame, player):
         self.x += 0.35 * min(1 + frame / 2000, 2)
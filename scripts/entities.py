@@ -3,9 +3,7 @@ import random
 
 import pygame
 
-from scripts.particles import Particle
-from scripts.spark import Spark
-from scripts.projectile import Projectile
+from scripts.sprite_cache import sprite_cache
 
 
 class PhysicsEntity:
@@ -46,9 +44,11 @@ class PhysicsEntity:
                 movement[1] + self.velocity[1],
             )
 
+            swept_rect = self.rect()
             self.pos[0] += frame_movement[0]
             entity_rect = self.rect()
-            for rect in tilemap.physics_rects_around(self.pos):
+            swept_rect.union_ip(entity_rect)
+            for rect in tilemap.physics_rects_in(swept_rect):
                 if entity_rect.colliderect(rect):
                     if frame_movement[0] > 0:
                         entity_rect.right = rect.left
@@ -58,9 +58,11 @@ class PhysicsEntity:
                         self.collisions["left"] = True
                     self.pos[0] = entity_rect.x
 
+            swept_rect = self.rect()
             self.pos[1] += frame_movement[1]
             entity_rect = self.rect()
-            for rect in tilemap.physics_rects_around(self.pos):
+            swept_rect.union_ip(entity_rect)
+            for rect in tilemap.physics_rects_in(swept_rect):
                 if entity_rect.colliderect(rect):
                     if frame_movement[1] > 0:
                         entity_rect.bottom = rect.top
@@ -84,15 +86,17 @@ class PhysicsEntity:
         self.animation.update()
 
     def render(self, surf, offset=(0, 0), spawn=0):
-        img = pygame.transform.flip(self.animation.img(), self.flip, False)
-        img = pygame.transform.flip(img, False, self.gravity < 0)
         if self.type == "dragon":
             if self.action == "attack":
                 self.size = (60, 80)
             else:
                 self.size = (100, 100)
+        size = None
         if spawn == 1 or self.type == "dragon":
-            img = pygame.transform.scale(img, self.size)
+            size = tuple(self.size)
+        img = sprite_cache.get(
+            self.animation.img(), self.flip, self.gravity < 0, size=size
+        )
 
         surf.blit(
             img,
@@ -140,25 +144,21 @@ class Enemy(PhysicsEntity):
                 )
                 if abs(dis[1]) < 16:
                     if (self.flip and dis[0] < 0) or (not self.flip and dis[0] > 0):
-                        self.game.sfx["shoot"].play()
+                        self.game.sfx["shoot"].play(pos=self.rect().center)
                         xSpeed = -1.5 if self.flip else 1.5
-                        self.game.projectiles.append(
-                            Projectile(
-                                [self.rect().centerx - 7, self.rect().centery],
-                                self.game.assets["projectile"],
-                                [xSpeed, 0],
-                                0,
-                                self.weaponType,
-                                self.gravity,
-                            )
+                        projectile = self.game.projectiles.spawn(
+                            [self.rect().centerx - 7, self.rect().centery],
+                            self.game.assets["projectile"],
+                            [xSpeed, 0],
+                            0,
+                            self.weaponType,
+                            self.gravity,
                         )
                         for _ in range(4):
-                            self.game.sparks.append(
-                                Spark(
-                                    self.game.projectiles[-1].pos,
-                                    random.random() - 0.5 + math.pi * self.flip,
-                                    2 + random.random(),
-                                )
+                            self.game.sparks.emit(
+                                projectile.pos,
+                                random.random() - 0.5 + math.pi * self.flip,
+                                2 + random.random(),
                             )
 
         elif random.random() < 0.01 and self.type != "dragon":
@@ -186,65 +186,52 @@ class Enemy(PhysicsEntity):
                 xSpeed = [-2] if self.flip else [2]
 
                 for i in xSpeed:
-                    self.game.projectiles.append(
-                        Projectile(
-                            [self.rect().centerx - 20, self.rect().centery - 5],
-                            self.game.assets["projectile2"],
-                            [i, 0],
-                            0,
-                            self.weaponType,
-                            self.gravity,
-                        )
+                    projectile = self.game.projectiles.spawn(
+                        [self.rect().centerx - 20, self.rect().centery - 5],
+                        self.game.assets["projectile2"],
+                        [i, 0],
+                        0,
+                        self.weaponType,
+                        self.gravity,
                     )
                 for _ in range(4):
-                    self.game.sparks.append(
-                        Spark(
-                            self.game.projectiles[-1].pos,
-                            random.random() - 0.5 + math.pi * self.flip,
-                            2 + random.random(),
-                        )
+                    self.game.sparks.emit(
+                        projectile.pos,
+                        random.random() - 0.5 + math.pi * self.flip,
+                        2 + random.random(),
                     )
             if self.animation.done:
                 self.idle = random.randint(30, 120)
                 self.set_action("idle")
 
-        if abs(self.game.player.dashing) >= 50:
-            if self.rect().colliderect(self.game.player.rect()):
-                self.game.screenshake = max(16, self.game.screenshake)
-                self.game.sfx["hit"].play()
-                for i in range(30):
-                    angle = random.random() * math.pi * 2
-                    speed = random.random() * 5
-                    self.game.sparks.append(
-                        Spark(self.rect().center, angle, 2 + random.random())
-                    )
-                    self.game.particles.append(
-                        Particle(
-                            self.game,
-                            "particle",
-                            self.rect().center,
-                            velocity=[
-                                math.cos(angle + math.pi) * speed * 0.5,
-                                math.sin(angle + math.pi) * speed * 0.5,
-                            ],
-                            frame=random.randint(0, 7),
-                        )
-                    )
-                self.game.sparks.append(
-                    Spark(self.rect().center, 0, 5 + random.random())
-                )
-                self.game.sparks.append(
-                    Spark(self.rect().center, math.pi, 5 + random.random())
-                )
-                self.health -= 1
         return self.health <= 0
 
+    def dash_hit(self):
+        self.game.screenshake = max(16, self.game.screenshake)
+        self.game.sfx["hit"].play(pos=self.rect().center)
+        for i in range(30):
+            angle = random.random() * math.pi * 2
+            speed = random.random() * 5
+            self.game.sparks.emit(self.rect().center, angle, 2 + random.random())
+            self.game.particles.emit(
+                "particle",
+                self.rect().center,
+                velocity=[
+                    math.cos(angle + math.pi) * speed * 0.5,
+                    math.sin(angle + math.pi) * speed * 0.5,
+                ],
+                frame=random.randint(0, 7),
+            )
+        self.game.sparks.emit(self.rect().center, 0, 5 + random.random())
+        self.game.sparks.emit(self.rect().center, math.pi, 5 + random.random())
+        self.health -= 1
+
     def render(self, surf, offset=(0, 0)):
         super().render(surf, offset=offset, spawn=self.spawn)
 
         if self.flip:
             surf.blit(
-                pygame.transform.flip(self.game.assets["gun"], True, False),
+                sprite_cache.get(self.game.assets["gun"], flip_x=True),
                 (
                     self.rect().centerx
                     - 4
@@ -270,9 +257,8 @@ class Enemy(PhysicsEntity):
         bar_y = self.pos[1] - offset[1] - bar_height - 5
 
         health_percentage = max(self.health / self.maxHealth, 0.0)
-        pygame.draw.rect(surf, (255, 0, 0), (bar_x, bar_y, bar_width, bar_height))
-        pygame.draw.rect(
-            surf,
+        surf.fill((255, 0, 0), (bar_x, bar_y, bar_width, bar_height))
+        surf.fill(
             (0, 255, 0),
             (bar_x, bar_y, int(bar_width * health_percentage), bar_height),
         )
@@ -326,7 +312,7 @@ class Player(PhysicsEntity):
                 self.velocity[1] = min(self.velocity[1], 0.5)
             elif self.gravity < 0:
                 self.velocity[1] = max(self.velocity[1], -0.5)
-                
+
             if self.collisions["right"]:
                 self.flip = False
             else:
@@ -346,14 +332,11 @@ class Player(PhysicsEntity):
                 angle = random.random() * math.pi * 2
                 speed = random.random() * 0.5 + 0.5
                 pvelocity = [math.cos(angle) * speed, math.sin(angle) * speed]
-                self.game.particles.append(
-                    Particle(
-                        self.game,
-                        "particle",
-                        self.rect().center,
-                        velocity=pvelocity,
-                        frame=random.randint(0, 7),
-                    )
+                self.game.particles.emit(
+                    "particle",
+                    self.rect().center,
+                    velocity=pvelocity,
+                    frame=random.randint(0, 7),
                 )
         if self.dashing > 0:
             self.dashing = max(0, self.dashing - 1)
@@ -364,14 +347,11 @@ class Player(PhysicsEntity):
             if abs(self.dashing) == 51:
                 self.velocity[0] *= 0.1
             pvelocity = [abs(self.dashing) / self.dashing * random.random() * 3, 0]
-            self.game.particles.append(
-                Particle(
-                    self.game,
-                    "particle",
-                    self.rect().center,
-                    velocity=pvelocity,
-                    frame=random.randint(0, 7),
-                )
+            self.game.particles.emit(
+                "particle",
+                self.rect().center,
+                velocity=pvelocity,
+                frame=random.randint(0, 7),
             )
 
         if self.velocity[0] > 0:
@@ -382,42 +362,34 @@ class Player(PhysicsEntity):
         if self.shoot:
             self.game.sfx["shoot"].play()
             if self.flip:
-                self.game.projectiles.append(
-                    Projectile(
-                        [self.rect().centerx - 7, self.rect().centery],
-                        self.game.assets["projectile"],
-                        [-1.5, 0],
-                        1,
-                        self.weaponType,
-                        self.gravity,
-                    )
+                projectile = self.game.projectiles.spawn(
+                    [self.rect().centerx - 7, self.rect().centery],
+                    self.game.assets["projectile"],
+                    [-1.5, 0],
+                    1,
+                    self.weaponType,
+                    self.gravity,
                 )
                 for i in range(4):
-                    self.game.sparks.append(
-                        Spark(
-                            self.game.projectiles[-1].pos,
-                            random.random() - 0.5 + math.pi,
-                            2 + random.random(),
-                        )
+                    self.game.sparks.emit(
+                        projectile.pos,
+                        random.random() - 0.5 + math.pi,
+                        2 + random.random(),
                     )
             if not self.flip:
-                self.game.projectiles.append(
-                    Projectile(
-                        [self.rect().centerx + 7, self.rect().centery],
-                        self.game.assets["projectile"],
-                        [1.5, 0],
-                        1,
-                        self.weaponType,
-                        self.gravity,
-                    )
+                projectile = self.game.projectiles.spawn(
+                    [self.rect().centerx + 7, self.rect().centery],
+                    self.game.assets["projectile"],
+                    [1.5, 0],
+                    1,
+                    self.weaponType,
+                    self.gravity,
                 )
                 for i in range(4):
-                    self.game.sparks.append(
-                        Spark(
-                            self.game.projectiles[-1].pos,
-                            random.random() - 0.5,
-                            2 + random.random(),
-                        )
+                    self.game.sparks.emit(
+                        projectile.pos,
+                        random.random() - 0.5,
+                        2 + random.random(),
                     )
             self.shoot = False
 
@@ -425,15 +397,18 @@ class Player(PhysicsEntity):
         if abs(self.dashing) <= 50:
             super().render(surf, offset=offset)
             if self.game.gun:
-                gun_img = self.game.assets["gun"].copy()
+                tint = None
                 if self.weaponType == 2:
-                    gun_img.fill((0, 255, 0), special_flags=pygame.BLEND_RGB_MULT)
+                    tint = (0, 255, 0)
                 elif self.weaponType == 3:
-                    gun_img.fill((255, 0, 0), special_flags=pygame.BLEND_RGB_MULT)
+                    tint = (255, 0, 0)
+                gun_img = sprite_cache.get(
+                    self.game.assets["gun"], flip_x=self.flip, tint=tint
+                )
 
                 if self.flip:
                     surf.blit(
-                        pygame.transform.flip(gun_img, True, False),
+                        gun_img,
                         (
                             self.rect().centerx
                             - 4
@@ -0,0 +1,225 @@
+import os
+import copy
+import json
+import hashlib
+
+import pygame
+
+from scripts.tilemap import Tilemap
+
+# assets used by what each spawner variant spawns
+SPAWNER_ASSETS = {
+    1: ["enemy/idle", "enemy/run"],
+    2: ["enemy/idle", "enemy/run"],
+    3: ["dragon/idle", "dragon/run", "dragon/attack", "projectile2"],
+}
+DUST_LEVELS = ["Insane-1", "Insane-2"]
+
+SPAWNERS = [("spawners", 0), ("spawners", 1), ("spawners", 2), ("spawners", 3)]
+JUMP_PADS = [("jump_pad", 0), ("jump_pad", 1)]
+LEVERS = [("lever", 0)]
+
+MANIFEST_PATH = "data/levels.json"
+META_EXT = ".meta"
+# bump when PreparedLevel.scan changes what it works out; the tables it uses
+# are part of metadata_version() already
+META_VERSION = 1
+# campaign levels are named <difficulty>-<number>
+DIFFICULTIES = ["Easy", "Medium", "Hard", "Insane"]
+
+
+def map_path(map_id):
+    if str(map_id).endswith(".json"):
+        return map_id
+    return "data/maps/" + str(map_id) + ".json"
+
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + META_EXT
+
+
+def campaign_order(map_id):
+    difficulty, _, number = map_id.partition("-")
+    if difficulty in DIFFICULTIES and number.isdigit():
+        return (DIFFICULTIES.index(difficulty), int(number), map_id)
+    return (len(DIFFICULTIES), 0, map_id)
+
+
+def campaign_levels(map_dir="data/maps"):
+    names = [name[:-5] for name in os.listdir(map_dir) if name.endswith(".json")]
+    return sorted(names, key=campaign_order)
+
+
+def load_levels(manifest_path=MANIFEST_PATH):
+    # the campaign order from the manifest compile_levels.py writes, or straight
+    # from data/maps when it hasn't been run since the scan last changed
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        return campaign_levels()
+    if manifest.get("version") != metadata_version():
+        return campaign_levels()
+    return manifest["levels"]
+
+
+def metadata_version():
+    # what a .meta file was compiled with, so one from another version of the
+    # scan is ignored rather than applied
+    tables = [SPAWNER_ASSETS, DUST_LEVELS, SPAWNERS, JUMP_PADS, LEVERS]
+    digest = hashlib.md5(json.dumps(tables, sort_keys=True).encode()).hexdigest()
+    return f"{META_VERSION}:{digest[:12]}"
+
+
+def read_metadata(path):
+    # the compiled metadata of a map, unless the map or the compiler changed
+    # since
+    meta_path = metadata_path(path)
+    try:
+        if os.stat(meta_path).st_mtime < os.stat(path).st_mtime:
+            return None
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if meta.get("version") != metadata_version():
+        return None
+    return meta
+
+
+class PreparedLevel:
+    # the part of Game.load_level that only depends on the map file: the
+    # parsed tilemap with its spawners, jump pads and levers taken out, the
+    # leaf emitters and the spots the gun can be placed on. It uses no random
+    # numbers and doesn't touch the game, so it can be built on a worker thread;
+    # load_level then only rolls the dice and creates the entities from a
+    # copy() of it.
+    #
+    # The template also keeps the sky its first play rolled, for restarts.
+    #
+    # Everything but the tilemap is also what compile_levels.py stores in a
+    # map's .meta file; when that is up to date it is read instead of worked out.
+    def __init__(self, game, map_id, use_metadata=True):
+        self.map_id = map_id
+        # (night, night sky frames), once the game has rolled them
+        self.sky = None
+        path = map_path(map_id)
+        self.tilemap = Tilemap(game, tile_size=16)
+        self.tilemap.load(path)
+        meta = read_metadata(path) if use_metadata else None
+        if meta is None:
+            self.scan()
+        else:
+            self.apply_metadata(meta)
+
+    def scan(self):
+        tilemap = self.tilemap
+        tile_size = tilemap.tile_size
+        tiles = list(tilemap.tilemap.values()) + tilemap.offgrid_tiles
+
+        self.assets = {"background", "clouds", "projectile"}
+        self.tile_counts = {}
+        for tile in tiles:
+            self.assets.add(tile["type"])
+            self.tile_counts[tile["type"]] = self.tile_counts.get(tile["type"], 0) + 1
+            if tile["type"] == "spawners":
+                self.assets.update(SPAWNER_ASSETS.get(tile["variant"], ()))
+        if "wall" in self.assets:
+            self.assets.add("pieces")
+        if "jump_pad" in self.assets:
+            self.assets.add("jump_pad_anim")
+        if self.map_id in DUST_LEVELS:
+            self.assets.add("dust")
+
+        ground_tile_positions = []
+        for loc in tilemap.tilemap:
+            tile = tilemap.tilemap[loc]
+            if tile["type"] in {"grass", "stone", "wall", "block"}:
+                ground_tile_positions.append(
+                    (tile["pos"][0] * tile_size, tile["pos"][1] * tile_size)
+                )
+
+        self.leaf_spawners = []
+        for tree in tilemap.extract([("large_decor", 2)], keep=True):
+            self.leaf_spawners.append(
+                pygame.Rect(4 + tree["pos"][0], 4 + tree["pos"][1], 23, 13)
+            )
+
+        # where the entity tiles are, so a compiled level can take them out
+        # without searching for them
+        taken = SPAWNERS + JUMP_PADS + LEVERS
+        self.offgrid_taken = [
+            i
+            for i, tile in enumerate(tilemap.offgrid_tiles)
+            if (tile["type"], tile["variant"]) in taken
+        ]
+        self.ongrid_taken = [
+            list(loc)
+            for loc, tile in tilemap.tilemap.items()
+            if (tile["type"], tile["variant"]) in taken
+        ]
+        self.spawners = tilemap.extract(SPAWNERS)
+        self.jump_pads = tilemap.extract(JUMP_PADS)
+        self.levers = tilemap.extract(LEVERS)
+
+        # one entry per ground tile, in the same order, so picking one with
+        # random.choice draws the same numbers as picking the tile did: the
+        # spot above the tile and whether it is free
+        self.gun_spots = []
+        for x, y in ground_tile_positions:
+            y -= tile_size
+            self.gun_spots.append((x, y, not tilemap.solid_check((x, y))))
+
+        # the player dies below the lowest tile left once the entities are out
+        lowest = tilemap.find_lowest_block_position()
+        self.lowest_block = None if lowest is None else list(lowest)
+
+    def apply_metadata(self, meta):
+        tilemap = self.tilemap
+        for i in reversed(meta["offgrid_taken"]):
+            tilemap.remove_offgrid(tilemap.offgrid_tiles[i])
+        for loc in meta["ongrid_taken"]:
+            tilemap.remove_tile(tuple(loc))
+
+        self.assets = set(meta["assets"])
+        self.tile_counts = meta["tile_counts"]
+        self.leaf_spawners = [pygame.Rect(rect) for rect in meta["leaf_spawners"]]
+        self.offgrid_taken = meta["offgrid_taken"]
+        self.ongrid_taken = meta["ongrid_taken"]
+        self.spawners = meta["spawners"]
+        self.jump_pads = meta["jump_pads"]
+        self.levers = meta["levers"]
+        self.gun_spots = [(x, y, bool(free)) for x, y, free in meta["gun_spots"]]
+        self.lowest_block = meta["lowest_block"]
+
+    def copy(self):
+        # a level to play, leaving this one as the pristine template to restart
+        # from: the tiles stay shared until they change (see Tilemap.own) and
+        # the entity tables are copied, as the entities keep their positions
+        level = copy.copy(self)
+        level.tilemap = self.tilemap.copy()
+        level.leaf_spawners = [rect.copy() for rect in self.leaf_spawners]
+        level.spawners = [dict(tile, pos=list(tile["pos"])) for tile in self.spawners]
+        level.jump_pads = [dict(tile, pos=list(tile["pos"])) for tile in self.jump_pads]
+        level.levers = [dict(tile, pos=list(tile["pos"])) for tile in self.levers]
+        return level
+
+    def metadata(self):
+        def entity_tiles(tiles):
+            return [
+                {"type": tile["type"], "variant": tile["variant"], "pos": tile["pos"]}
+                for tile in tiles
+            ]
+
+        return {
+            "assets": sorted(self.assets),
+            "tile_counts": self.tile_counts,
+            "leaf_spawners": [list(rect) for rect in self.leaf_spawners],
+            "offgrid_taken": self.offgrid_taken,
+            "ongrid_taken": self.ongrid_taken,
+            "spawners": entity_tiles(self.spawners),
+            "jump_pads": entity_tiles(self.jump_pads),
+            "levers": entity_tiles(self.levers),
+            "gun_spots": [[x, y, int(free)] for x, y, free in self.gun_spots],
+            "lowest_block": self.lowest_block,
+        }
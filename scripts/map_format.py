@@ -0,0 +1,204 @@
+import os
+import mmap
+import struct
+
+import numpy as np
+
+MAP_EXT = ".map"
+MAGIC = b"NINJAMAP"
+VERSION = 1
+# magic, version, tile_size, then the byte size of the type name table and the
+# number of tile and offgrid records that follow it
+HEADER = struct.Struct("<8sHHIII")
+
+# ongrid tiles in the order they appear in the JSON file; the order matters,
+# the game picks gun spots by index into it. flags say which of the optional
+# keys the tile had.
+TILE_DTYPE = np.dtype(
+    [
+        ("x", "<i2"),
+        ("y", "<i2"),
+        ("type", "u1"),
+        ("variant", "u1"),
+        ("flags", "u1"),
+        ("health", "i1"),
+        ("blockShake", "<i2"),
+        ("falling", "<i2"),
+    ]
+)
+HAS_BLOCK_SHAKE = 1
+HAS_FALLING = 2
+HAS_HEALTH = 4
+
+# offgrid tiles; flags say which coordinates were whole numbers in the JSON
+OFFGRID_DTYPE = np.dtype(
+    [
+        ("type", "u1"),
+        ("variant", "u1"),
+        ("flags", "u1"),
+        ("x", "<f8"),
+        ("y", "<f8"),
+    ]
+)
+X_IS_INT = 1
+Y_IS_INT = 2
+
+
+def binary_map_path(path):
+    # the converted copy of a JSON map, if there is one at least as new as it
+    if path.endswith(MAP_EXT):
+        return path
+    binary = os.path.splitext(path)[0] + MAP_EXT
+    try:
+        if os.stat(binary).st_mtime >= os.stat(path).st_mtime:
+            return binary
+    except FileNotFoundError:
+        pass
+    return None
+
+
+def encode_map(map_data):
+    types = []
+    for tile in list(map_data["tilemap"].values()) + map_data["offgrid"]:
+        if tile["type"] not in types:
+            types.append(tile["type"])
+    type_ids = {name: i for i, name in enumerate(types)}
+    type_table = "\n".join(types).encode()
+
+    tiles = np.zeros(len(map_data["tilemap"]), dtype=TILE_DTYPE)
+    for i, tile in enumerate(map_data["tilemap"].values()):
+        flags = 0
+        if "blockShake" in tile:
+            flags |= HAS_BLOCK_SHAKE
+        if "falling" in tile:
+            flags |= HAS_FALLING
+        if "health" in tile:
+            flags |= HAS_HEALTH
+        tiles[i] = (
+            tile["pos"][0],
+            tile["pos"][1],
+            type_ids[tile["type"]],
+            tile["variant"],
+            flags,
+            tile.get("health", 0),
+            tile.get("blockShake", 0),
+            tile.get("falling", 0),
+        )
+
+    offgrid = np.zeros(len(map_data["offgrid"]), dtype=OFFGRID_DTYPE)
+    for i, tile in enumerate(map_data["offgrid"]):
+        flags = 0
+        if isinstance(tile["pos"][0], int):
+            flags |= X_IS_INT
+        if isinstance(tile["pos"][1], int):
+            flags |= Y_IS_INT
+        offgrid[i] = (
+            type_ids[tile["type"]],
+            tile["variant"],
+            flags,
+            tile["pos"][0],
+            tile["pos"][1],
+        )
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        map_data["tile_size"],
+        len(type_table),
+        len(tiles),
+        len(offgrid),
+    )
+    return header + type_table + tiles.tobytes() + offgrid.tobytes()
+
+
+def read_records(path):
+    # the header fields, type names and the tile and offgrid columns as lists
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, tile_size, table_size, tile_count, offgrid_count = (
+            HEADER.unpack_from(data)
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} map")
+        offset = HEADER.size
+        types = data[offset : offset + table_size].decode().split("\n")
+        offset += table_size
+        tiles = np.frombuffer(data, TILE_DTYPE, tile_count, offset)
+        offset += tiles.nbytes
+        offgrid = np.frombuffer(data, OFFGRID_DTYPE, offgrid_count, offset)
+        tile_columns = {name: tiles[name].tolist() for name in TILE_DTYPE.names}
+        offgrid_columns = {name: offgrid[name].tolist() for name in OFFGRID_DTYPE.names}
+        # the arrays point into the mapping, which can't close while they exist
+        del tiles, offgrid
+    finally:
+        data.close()
+    return tile_size, types, tile_columns, offgrid_columns
+
+
+def read_offgrid(types, columns):
+    offgrid = []
+    for type_id, variant, flags, x, y in zip(
+        columns["type"],
+        columns["variant"],
+        columns["flags"],
+        columns["x"],
+        columns["y"],
+    ):
+        pos = [int(x) if flags & X_IS_INT else x, int(y) if flags & Y_IS_INT else y]
+        offgrid.append({"type": types[type_id], "variant": variant, "pos": pos})
+    return offgrid
+
+
+def build_tile(types, x, y, type_id, variant, flags, health, block_shake, falling):
+    tile = {"type": types[type_id], "variant": variant, "pos": [x, y]}
+    if flags & HAS_BLOCK_SHAKE:
+        tile["blockShake"] = block_shake
+    if flags & HAS_FALLING:
+        tile["falling"] = falling
+    if flags & HAS_HEALTH:
+        tile["health"] = health
+    return tile
+
+
+def read_map(path):
+    # the map exactly as it was in JSON, optional keys and their order included
+    tile_size, types, tiles, offgrid = read_records(path)
+    tilemap = {}
+    for record in zip(*(tiles[name] for name in TILE_DTYPE.names)):
+        tile = build_tile(types, *record)
+        tilemap[str(tile["pos"][0]) + ";" + str(tile["pos"][1])] = tile
+    return {
+        "tilemap": tilemap,
+        "tile_size": tile_size,
+        "offgrid": read_offgrid(types, offgrid),
+    }
+
+
+def load_map(path):
+    # the tilemap the way Tilemap.load sets it up for play, in the same pass:
+    # keyed by (x, y), shake and fall timers reset and wall health filled in
+    tile_size, types, tiles, offgrid = read_records(path)
+    tilemap = {}
+    for x, y, type_id, variant, flags, health in zip(
+        tiles["x"],
+        tiles["y"],
+        tiles["type"],
+        tiles["variant"],
+        tiles["flags"],
+        tiles["health"],
+    ):
+        tile_type = types[type_id]
+        tile = {
+            "type": tile_type,
+            "variant": variant,
+            "pos": [x, y],
+            "blockShake": 0,
+            "falling": 0,
+        }
+        if tile_type == "wall":
+            tile["health"] = 5 if variant == 0 else 1
+        elif flags & HAS_HEALTH:
+            tile["health"] = health
+        tilemap[(x, y)] = tile
+    return tilemap, tile_size, read_offgrid(types, offgrid)
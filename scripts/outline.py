@@ -0,0 +1,118 @@
+import weakref
+
+import pygame
+
+OUTLINE_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class OutlineSurface(pygame.Surface):
+    # a drawing surface that keeps a mask of its opaque pixels up to date as
+    # images are blitted onto it, so the outline pass doesn't have to rebuild
+    # one from the whole surface every frame. Each image's mask is computed the
+    # first time it is drawn (a sprite frame, a baked tile chunk) and reused.
+    masks = weakref.WeakKeyDictionary()
+
+    def __init__(self, size):
+        super().__init__(size, pygame.SRCALPHA)
+        self.mask = pygame.Mask(size)
+        # translucent pixels below the mask threshold; where two of them
+        # overlap their alpha adds up, so that area is read back from the surface
+        self.soft = pygame.Mask(size)
+        # pixels whose mask bit has to be read back before the outline is drawn
+        self.pending = pygame.Mask(size)
+        self.silhouette = pygame.Surface(size, pygame.SRCALPHA)
+        # while track is set, the rect of everything drawn is collected in rects
+        self.track = False
+        self.rects = []
+
+    def image_masks(self, img):
+        masks = self.masks.get(img)
+        if masks is None:
+            mask = pygame.mask.from_surface(img)
+            soft = pygame.mask.from_surface(img, 0)
+            soft.erase(mask, (0, 0))
+            masks = (mask, soft if soft.count() else None)
+            self.masks[img] = masks
+        return masks
+
+    def record(self, source, dest, area=None):
+        if area is None:
+            mask, soft = self.image_masks(source)
+        else:
+            area = pygame.Rect(area).clip(source.get_rect())
+            mask, soft = self.image_masks(source.subsurface(area))
+        # Surface.blit truncates float positions towards zero
+        pos = (int(dest[0]), int(dest[1]))
+        self.mask.draw(mask, pos)
+        if soft is not None:
+            self.pending.draw(self.soft.overlap_mask(soft, pos), (0, 0))
+            self.soft.draw(soft, pos)
+
+    def touch(self, rect):
+        # for changes made by something other than a plain blit or fill, e.g.
+        # pygame.draw; the mask is read back from the pixels in rect later
+        rect = pygame.Rect(rect).clip(self.get_rect())
+        if rect.width and rect.height:
+            self.pending.draw(pygame.Mask(rect.size, fill=True), rect.topleft)
+            if self.track:
+                self.rects.append(rect)
+
+    def read_back(self):
+        for rect in self.pending.get_bounding_rects():
+            self.mask.erase(pygame.Mask(rect.size, fill=True), rect.topleft)
+            self.mask.draw(
+                pygame.mask.from_surface(self.subsurface(rect)), rect.topleft
+            )
+        self.pending.clear()
+
+    def blit(self, source, dest, area=None, special_flags=0):
+        rect = super().blit(source, dest, area, special_flags)
+        if special_flags:
+            self.touch(rect)
+        else:
+            self.record(source, dest, area)
+            if self.track:
+                self.rects.append(rect)
+        return rect
+
+    def blits(self, blit_sequence, doreturn=True):
+        blit_sequence = list(blit_sequence)
+        rects = super().blits(blit_sequence, doreturn or self.track)
+        for blit in blit_sequence:
+            self.record(blit[0], blit[1], blit[2] if len(blit) > 2 else None)
+        if self.track:
+            self.rects.extend(rects)
+        return rects if doreturn else None
+
+    def fill(self, color, rect=None, special_flags=0):
+        result = super().fill(color, rect, special_flags)
+        if special_flags:
+            self.touch(self.get_rect() if rect is None else rect)
+            return result
+        alpha = pygame.Color(color).a
+        if rect is None:
+            rect = self.get_rect()
+        rect = pygame.Rect(rect)
+        if rect.width > 0 and rect.height > 0:
+            if self.track:
+                self.rects.append(rect)
+            area = pygame.Mask(rect.size, fill=True)
+            self.pending.erase(area, rect.topleft)
+            if alpha > 127:
+                self.mask.draw(area, rect.topleft)
+            else:
+                self.mask.erase(area, rect.topleft)
+            if 0 < alpha <= 127:
+                self.soft.draw(area, rect.topleft)
+            else:
+                self.soft.erase(area, rect.topleft)
+        return result
+
+    def render_outline(self, surf):
+        # dark 1px outline around everything drawn so far, composited onto surf
+        self.read_back()
+        self.mask.to_surface(
+            self.silhouette, setcolor=(0, 0, 0, 180), unsetcolor=(0, 0, 0, 0)
+        )
+        for offset in OUTLINE_OFFSETS:
+            surf.blit(self.silhouette, offset)
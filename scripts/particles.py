@@ -1,30 +1,87 @@
-class Particle:
-    def __init__(self, game, p_type, pos, velocity=[0, 0], frame=0):
-        self.game = game
-        self.type = p_type
-        self.pos = list(pos)
-        self.velocity = list(velocity)
-        self.animation = self.game.assets["particle/" + p_type].copy()
-        self.animation.frame = frame
+import numpy as np
 
-    def update(self):
-        kill = False
-        if self.animation.done:
-            kill = True
+from scripts.pool import ArrayPool
+
+# particle types whose x position sways with their animation frame
+SWAY_TYPES = {"leaf"}
+
+
+class ParticleSystem(ArrayPool):
+    def __init__(self, game, p_types, capacity=256):
+        # every animation frame of every type goes into one list, so a particle's
+        # image is first + frame // duration
+        self.images = []
+        self.types = {}
+        # the images are kept here for good, so the registry mustn't drop them
+        game.assets.pin("particle/" + p_type for p_type in p_types)
+        for p_type in p_types:
+            animation = game.assets["particle/" + p_type]
+            self.types[p_type] = (
+                len(self.images),
+                animation.img_duration,
+                animation.img_duration * len(animation.images) - 1,
+                0.3 if p_type in SWAY_TYPES else 0,
+            )
+            self.images.extend(animation.images)
+        self.half_sizes = np.array(
+            [(img.get_width() // 2, img.get_height() // 2) for img in self.images]
+        )
 
-        self.pos[0] += self.velocity[0]
-        self.pos[1] += self.velocity[1]
+        super().__init__(capacity)
 
-        self.animation.update()
+    def allocate(self, capacity):
+        self.pos = np.zeros((capacity, 2))
+        self.velocity = np.zeros((capacity, 2))
+        self.frame = np.zeros(capacity, dtype=np.int64)
+        self.first = np.zeros(capacity, dtype=np.int64)
+        self.duration = np.ones(capacity, dtype=np.int64)
+        self.last = np.zeros(capacity, dtype=np.int64)
+        self.sway = np.zeros(capacity)
+
+    def arrays(self):
+        return (
+            self.pos,
+            self.velocity,
+            self.frame,
+            self.first,
+            self.duration,
+            self.last,
+            self.sway,
+        )
+
+    def emit(self, p_type, pos, velocity=(0, 0), frame=0):
+        i = self.add()
+        self.pos[i] = pos
+        self.velocity[i] = velocity
+        self.frame[i] = frame
+        self.first[i], self.duration[i], self.last[i], self.sway[i] = self.types[p_type]
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+        pos = self.pos[:n]
+        frame = self.frame[:n]
+        last = self.last[:n]
+        # like Animation.done: a particle is removed on the update after it
+        # reached its last frame
+        alive = frame < last
 
-        return kill
+        pos += self.velocity[:n]
+        frame += 1
+        np.minimum(frame, last, out=frame)
+        pos[:, 0] += np.sin(frame * 0.035) * self.sway[:n]
+        self.keep(alive)
 
     def render(self, surf, offset=(0, 0)):
-        img = self.animation.img()
-        surf.blit(
-            img,
-            (
-                self.pos[0] - offset[0] - img.get_width() // 2,
-                self.pos[1] - offset[1] - img.get_height() // 2,
-            ),
+        n = self.count
+        if not n:
+            return
+        image = self.first[:n] + self.frame[:n] // self.duration[:n]
+        # truncate towards zero like Surface.blit does with float positions
+        dest = (self.pos[:n] - offset - self.half_sizes[image]).astype(np.int64)
+        images = self.images
+        surf.blits(
+            [(images[i], xy) for i, xy in zip(image.tolist(), dest.tolist())],
+            doreturn=False,
         )
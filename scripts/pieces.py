@@ -1,8 +1,11 @@
-import pygame
+from scripts.sprite_cache import sprite_cache
 
 
 class Piece:
     def __init__(self, img, pos, speed):
+        self.reset(img, pos, speed)
+
+    def reset(self, img, pos, speed):
         self.img = img
         self.pos = pos
         self.speed = speed
@@ -18,6 +21,6 @@ class Piece:
             self.pos[1] - offset[1],
         )
         surf.blit(
-            pygame.transform.smoothscale(self.img, [5, 5]),
+            sprite_cache.get(self.img, size=(5, 5), smooth=True),
             (render_pos[0], render_pos[1]),
         )
@@ -0,0 +1,115 @@
+class BasePool:
+    # the counters every pool reports: a hit reuses a free slot, a miss had to
+    # allocate a new one. Subclasses say how many slots are live and free.
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.high_water = len(self)
+
+    def stats(self):
+        return {
+            "live": len(self),
+            "free": self.free_slots(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "high_water": self.high_water,
+        }
+
+    def count_spawn(self, hit):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.high_water = max(self.high_water, len(self))
+
+
+class Pool(BasePool):
+    # live objects are kept in a list and removed by swapping the last one into
+    # their slot; removed objects go to a free list and are reset on reuse
+    def __init__(self, cls):
+        self.cls = cls
+        self.live = []
+        self.free = []
+        self.reset_stats()
+
+    def free_slots(self):
+        return len(self.free)
+
+    def __len__(self):
+        return len(self.live)
+
+    def __iter__(self):
+        return iter(self.live)
+
+    def __reversed__(self):
+        # safe to remove the current object, or spawn new ones, while iterating
+        return reversed(self.live)
+
+    def spawn(self, *args, **kwargs):
+        hit = bool(self.free)
+        if hit:
+            obj = self.free.pop()
+            obj.reset(*args, **kwargs)
+        else:
+            obj = self.cls(*args, **kwargs)
+        obj.slot = len(self.live)
+        self.live.append(obj)
+        self.count_spawn(hit)
+        return obj
+
+    def remove(self, obj):
+        last = self.live.pop()
+        if last is not obj:
+            self.live[obj.slot] = last
+            last.slot = obj.slot
+        self.free.append(obj)
+
+    def clear(self):
+        self.free.extend(self.live)
+        self.live.clear()
+
+
+class ArrayPool(BasePool):
+    # live elements are the first count rows of the NumPy arrays a subclass
+    # creates in allocate() and lists in arrays(); the arrays double in size
+    # when they are full
+    def __init__(self, capacity):
+        self.count = 0
+        self.allocate(capacity)
+        self.reset_stats()
+
+    def capacity(self):
+        return len(self.arrays()[0])
+
+    def free_slots(self):
+        return self.capacity() - self.count
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def grow(self):
+        old = self.arrays()
+        self.allocate(self.capacity() * 2)
+        for new, array in zip(self.arrays(), old):
+            new[: self.count] = array[: self.count]
+
+    def add(self):
+        # the row of a new element, for the subclass to fill in
+        hit = self.count < self.capacity()
+        if not hit:
+            self.grow()
+        i = self.count
+        self.count += 1
+        self.count_spawn(hit)
+        return i
+
+    def keep(self, alive):
+        # drop the rows where alive is false, keeping the rest in order
+        if not alive.all():
+            keep = alive.nonzero()[0]
+            for array in self.arrays():
+                array[: len(keep)] = array[keep]
+            self.count = len(keep)
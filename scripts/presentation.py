@@ -0,0 +1,67 @@
+import math
+
+import pygame
+
+SCALE_MODES = ["smooth", "nearest", "scaled"]
+
+
+def parse_window_size(text):
+    width, height = text.lower().split("x")
+    return (int(width), int(height))
+
+
+class Presenter:
+    # puts the low resolution frame on the window:
+    #   smooth  - bilinear stretch to the whole window (the original look)
+    #   nearest - largest whole-number scale that fits, letterboxed
+    #   scaled  - a window in SDL's SCALED mode; the renderer does the scaling
+    def __init__(self, size, window_size=(640, 480), mode="smooth"):
+        self.mode = mode
+        if mode == "scaled":
+            self.screen = pygame.display.set_mode(size, pygame.SCALED)
+            self.buffer = None
+            self.scale = (1, 1)
+            self.pos = (0, 0)
+            return
+
+        self.screen = pygame.display.set_mode(window_size)
+        if mode == "nearest":
+            factor = max(1, min(window_size[0] // size[0], window_size[1] // size[1]))
+            scaled_size = (size[0] * factor, size[1] * factor)
+        else:
+            scaled_size = window_size
+        self.buffer = pygame.Surface(scaled_size)
+        # per axis, as smooth stretches a 4:3 frame to any window shape
+        self.scale = (scaled_size[0] / size[0], scaled_size[1] / size[1])
+        self.pos = (
+            (window_size[0] - scaled_size[0]) // 2,
+            (window_size[1] - scaled_size[1]) // 2,
+        )
+
+    def window_rect(self, rect):
+        # grown by two display pixels for the outline and the smooth filter,
+        # then rounded outwards on each axis
+        rect = rect.inflate(4, 4)
+        left = math.floor(self.pos[0] + rect.left * self.scale[0])
+        top = math.floor(self.pos[1] + rect.top * self.scale[1])
+        right = math.ceil(self.pos[0] + rect.right * self.scale[0])
+        bottom = math.ceil(self.pos[1] + rect.bottom * self.scale[1])
+        return pygame.Rect(left, top, right - left, bottom - top)
+
+    def present(self, surf, offset=(0, 0)):
+        # offset (screenshake) is in low resolution pixels
+        pos = (
+            self.pos[0] + offset[0] * self.scale[0],
+            self.pos[1] + offset[1] * self.scale[1],
+        )
+        if self.buffer is None:
+            self.screen.blit(surf, pos)
+            return
+
+        if self.mode == "smooth":
+            pygame.transform.smoothscale(surf, self.buffer.get_size(), self.buffer)
+        else:
+            pygame.transform.scale(surf, self.buffer.get_size(), self.buffer)
+            if self.pos != (0, 0):
+                self.screen.fill((0, 0, 0))
+        self.screen.blit(self.buffer, pos)
@@ -0,0 +1,119 @@
+import csv
+import json
+import time
+from collections import deque
+
+import pygame
+
+
+class FrameProfiler:
+    def __init__(self, path=None, overlay=False, window=60):
+        self.overlay = overlay
+        self.enabled = overlay or path is not None
+        self.history = deque(maxlen=window)
+        self.phases = {}
+        self.totals = {}
+        self.frames = 0
+        self.last = 0
+
+        self.file = None
+        self.writer = None
+        if path is not None:
+            self.file = open(path, "w", newline="")
+            self.jsonl = path.endswith(".jsonl")
+
+        self.font = None
+        self.overlay_lines = []
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        self.enabled = True
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self.phases = {}
+        self.last = time.perf_counter()
+
+    def lap(self, name):
+        # time spent since the previous lap is charged to this phase
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases[name] = self.phases.get(name, 0) + now - self.last
+        self.last = now
+
+    def end_frame(self, frame, level):
+        if not self.enabled:
+            return
+        self.frames += 1
+        for name, duration in self.phases.items():
+            self.totals[name] = self.totals.get(name, 0) + duration
+        self.history.append(self.phases)
+
+        if self.file is not None:
+            record = {"frame": frame, "level": level}
+            for name, duration in self.phases.items():
+                record[name] = round(duration * 1000, 4)
+            record["total"] = round(sum(self.phases.values()) * 1000, 4)
+            self.write(record)
+
+        if self.overlay and self.frames % 15 == 0:
+            self.update_overlay()
+
+    def write(self, record):
+        if self.jsonl:
+            self.file.write(json.dumps(record) + "\n")
+            return
+        if self.writer is None:
+            self.writer = csv.DictWriter(
+                self.file, fieldnames=list(record), extrasaction="ignore"
+            )
+            self.writer.writeheader()
+        self.writer.writerow(record)
+
+    def reset(self):
+        self.totals = {}
+        self.frames = 0
+        self.history.clear()
+
+    def means(self):
+        # mean milliseconds per frame for every phase since the last reset
+        return {name: total * 1000 / self.frames for name, total in self.totals.items()}
+
+    def recent_means(self):
+        means = {}
+        for phases in self.history:
+            for name, duration in phases.items():
+                means[name] = means.get(name, 0) + duration
+        for name in means:
+            means[name] *= 1000 / len(self.history)
+        return means
+
+    def update_overlay(self):
+        if self.font is None:
+            self.font = pygame.font.Font(None, 18)
+        means = self.recent_means()
+        total = sum(means.values())
+        lines = [f"frame {total:5.2f}ms ({1000 / max(total, 0.001):.0f} fps)"]
+        for name, duration in sorted(means.items(), key=lambda x: -x[1]):
+            lines.append(f"{name:12} {duration:5.2f}ms")
+        self.overlay_lines = [
+            self.font.render(line, True, (255, 255, 255)) for line in lines
+        ]
+
+    def render(self, surf):
+        if not self.overlay or not self.overlay_lines:
+            return
+        width = max(line.get_width() for line in self.overlay_lines) + 8
+        height = len(self.overlay_lines) * 14 + 6
+        background = pygame.Surface((width, height), pygame.SRCALPHA)
+        background.fill((0, 0, 0, 160))
+        surf.blit(background, (4, 4))
+        for i, line in enumerate(self.overlay_lines):
+            surf.blit(line, (8, 7 + i * 14))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -1,8 +1,13 @@
 import math
-import pygame
+
+from scripts.sprite_cache import sprite_cache
+
 
 class Projectile:
     def __init__(self, pos, img, speed, entity, weaponType, gravity = 0.1):
+        self.reset(pos, img, speed, entity, weaponType, gravity)
+
+    def reset(self, pos, img, speed, entity, weaponType, gravity=0.1):
         self.pos = list(pos)
         self.img = img
         self.speed = speed
@@ -26,12 +31,12 @@ class Projectile:
                 self.speed[1] = 3
 
         if self.weaponType == 4:
-            self.img = pygame.transform.scale(self.img, [10, 10])
+            self.img = sprite_cache.get(self.img, size=(10, 10))
 
-    def update(self, player, gravity = 0.1):
+    def update(self, player_rect, gravity=0.1):
         if self.weaponType == 4:
-            playerX = player.rect().centerx
-            PlayerY = player.rect().centery
+            playerX = player_rect.centerx
+            PlayerY = player_rect.centery
             dx = playerX - self.pos[0]
             dy = PlayerY - self.pos[1]
             distance = math.sqrt(dx**2 + dy**2)
@@ -78,10 +83,9 @@ class Projectile:
 
     def render(self, surf, offset=(0, 0)):
         if self.weaponType == 2:
-            img = self.img.copy()
-            img.fill((0, 255, 0), special_flags=pygame.BLEND_RGB_MULT)
+            img = sprite_cache.get(self.img, tint=(0, 255, 0))
         else:
-            img = self.img.copy()
+            img = self.img
 
         surf.blit(
             img,
@@ -1,26 +1,115 @@
 import math
 
+import numpy as np
+
 import pygame
 
-class Spark:
-    def __init__(self, pos, angle, speed):
-        self.pos = list(pos)
-        self.angle = angle
-        self.speed = speed
-        
+from scripts.outline import OutlineSurface
+from scripts.pool import ArrayPool
+
+# corners of the spark diamond as (turn from the spark's angle, length)
+SPARK_SHAPE = ((0, 3), (math.pi * 0.5, 0.5), (math.pi, 3), (-math.pi * 0.5, 0.5))
+SPARK_TURNS = np.array([turn for turn, length in SPARK_SHAPE])
+SPARK_LENGTHS = np.array([[length] for turn, length in SPARK_SHAPE])
+
+# sparks are drawn from sprites pre-rasterized at these angle and speed steps
+ANGLE_BUCKETS = 64
+SPEED_STEP = 0.25
+
+
+class SparkSystem(ArrayPool):
+    def __init__(self, capacity=256, exact=False):
+        # exact draws every spark as a polygon instead of a quantized sprite
+        self.exact = exact
+        self.sprites = {}
+        super().__init__(capacity)
+
+    def allocate(self, capacity):
+        self.pos = np.zeros((capacity, 2))
+        self.angle = np.zeros(capacity)
+        self.speed = np.zeros(capacity)
+
+    def arrays(self):
+        return self.pos, self.angle, self.speed
+
+    def emit(self, pos, angle, speed):
+        i = self.add()
+        self.pos[i] = pos
+        self.angle[i] = angle
+        self.speed[i] = speed
+
     def update(self):
-        self.pos[0] += math.cos(self.angle) * self.speed
-        self.pos[1] += math.sin(self.angle) * self.speed
-        
-        self.speed = max(0, self.speed - 0.1)
-        return not self.speed
-    
+        n = self.count
+        if not n:
+            return
+        angle = self.angle[:n]
+        speed = self.speed[:n]
+
+        self.pos[:n, 0] += np.cos(angle) * speed
+        self.pos[:n, 1] += np.sin(angle) * speed
+        speed -= 0.1
+        np.maximum(speed, 0, out=speed)
+
+        self.keep(speed > 0)
+
+    def bake_sprite(self, key):
+        speed_bucket, angle_bucket = divmod(key, ANGLE_BUCKETS)
+        angle = angle_bucket * math.pi * 2 / ANGLE_BUCKETS
+        speed = speed_bucket * SPEED_STEP
+        half = math.ceil(speed * 3) + 1
+        sprite = pygame.Surface((half * 2 + 1, half * 2 + 1))
+        sprite.set_colorkey((0, 0, 0))
+        pygame.draw.polygon(
+            sprite,
+            (255, 255, 255),
+            [
+                (
+                    half + math.cos(angle + turn) * speed * length,
+                    half + math.sin(angle + turn) * speed * length,
+                )
+                for turn, length in SPARK_SHAPE
+            ],
+        )
+        self.sprites[key] = sprite
+        return sprite
+
     def render(self, surf, offset=(0, 0)):
-        render_points = [
-            (self.pos[0] + math.cos(self.angle) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle + math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-            (self.pos[0] + math.cos(self.angle + math.pi) * self.speed * 3 - offset[0], self.pos[1] + math.sin(self.angle + math.pi) * self.speed * 3 - offset[1]),
-            (self.pos[0] + math.cos(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[0], self.pos[1] + math.sin(self.angle - math.pi * 0.5) * self.speed * 0.5 - offset[1]),
-        ]
-        
-        pygame.draw.polygon(surf, (255, 255, 255), render_points)
\ No newline at end of file
+        n = self.count
+        if not n:
+            return
+        if self.exact:
+            self.render_polygons(surf, offset)
+            return
+
+        angle_bucket = np.rint(self.angle[:n] * (ANGLE_BUCKETS / (math.pi * 2)))
+        angle_bucket = angle_bucket.astype(np.int64) % ANGLE_BUCKETS
+        speed_bucket = np.maximum(np.rint(self.speed[:n] / SPEED_STEP), 1)
+        speed_bucket = speed_bucket.astype(np.int64)
+        half = np.ceil(speed_bucket * (SPEED_STEP * 3)).astype(np.int64) + 1
+        dest = np.floor(self.pos[:n] - offset).astype(np.int64) - half[:, None]
+
+        sprites = self.sprites
+        blits = []
+        for key, xy in zip(
+            (speed_bucket * ANGLE_BUCKETS + angle_bucket).tolist(), dest.tolist()
+        ):
+            sprite = sprites.get(key)
+            if sprite is None:
+                sprite = self.bake_sprite(key)
+            blits.append((sprite, xy))
+        surf.blits(blits, doreturn=False)
+
+    def render_polygons(self, surf, offset):
+        n = self.count
+        turned = self.angle[:n, None] + SPARK_TURNS
+        points = np.stack((np.cos(turned), np.sin(turned)), axis=2)
+        points *= self.speed[:n, None, None]
+        points *= SPARK_LENGTHS
+        points += self.pos[:n, None]
+        points -= offset
+        # plain draws bypass OutlineSurface.blit, so report what they cover
+        touch = surf.touch if isinstance(surf, OutlineSurface) else None
+        for polygon in points.tolist():
+            rect = pygame.draw.polygon(surf, (255, 255, 255), polygon)
+            if touch is not None:
+                touch(rect)
@@ -0,0 +1,47 @@
+class SpatialHash:
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = {}
+        self.order = {}
+
+    def clear(self):
+        self.cells.clear()
+        self.rects.clear()
+        self.order.clear()
+
+    def cells_for(self, rect):
+        for x in range(
+            rect.left // self.cell_size, (rect.right - 1) // self.cell_size + 1
+        ):
+            for y in range(
+                rect.top // self.cell_size, (rect.bottom - 1) // self.cell_size + 1
+            ):
+                yield (x, y)
+
+    def insert(self, item, rect):
+        self.rects[item] = rect
+        self.order[item] = len(self.order)
+        for cell in self.cells_for(rect):
+            if cell in self.cells:
+                self.cells[cell].append(item)
+            else:
+                self.cells[cell] = [item]
+
+    def query_point(self, pos):
+        # items whose rect contains pos, in insertion order
+        cell = (int(pos[0] // self.cell_size), int(pos[1] // self.cell_size))
+        return [
+            item
+            for item in self.cells.get(cell, ())
+            if self.rects[item].collidepoint(pos)
+        ]
+
+    def query_rect(self, rect):
+        # items whose rect overlaps rect, each once, in insertion order
+        found = set()
+        for cell in self.cells_for(rect):
+            for item in self.cells.get(cell, ()):
+                if self.rects[item].colliderect(rect):
+                    found.add(item)
+        return sorted(found, key=self.order.get)
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+import pygame
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+class SpriteCache:
+    # flipped, scaled and tinted copies of images, built on first use and
+    # dropped least recently used first once they take more than max_bytes
+    def __init__(self, max_bytes=8 << 20):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.surfaces = OrderedDict()
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        return {
+            "sprites": len(self.surfaces),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+    def discard(self, images):
+        # drop the copies made of images, and the copies made of those, e.g.
+        # once the asset registry lets the images go
+        images = set(images)
+        while images:
+            keys = [key for key in self.surfaces if key[0] in images]
+            images = set()
+            for key in keys:
+                surface = self.surfaces.pop(key)
+                self.bytes -= surface_bytes(surface)
+                images.add(surface)
+
+    def get(self, img, flip_x=False, flip_y=False, size=None, tint=None, smooth=False):
+        # transforms are applied as flip, scale, tint; size and tint are tuples
+        if not (flip_x or flip_y) and size is None and tint is None:
+            return img
+        key = (img, flip_x, flip_y, size, tint, smooth)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = img
+        if flip_x or flip_y:
+            surface = pygame.transform.flip(surface, flip_x, flip_y)
+        if size is not None:
+            if smooth:
+                surface = pygame.transform.smoothscale(surface, size)
+            else:
+                surface = pygame.transform.scale(surface, size)
+        if tint is not None:
+            if surface is img:
+                surface = img.copy()
+            surface.fill(tint, special_flags=pygame.BLEND_RGB_MULT)
+
+        self.surfaces[key] = surface
+        self.bytes += surface_bytes(surface)
+        while self.bytes > self.max_bytes and len(self.surfaces) > 1:
+            old_key, old = self.surfaces.popitem(last=False)
+            self.bytes -= surface_bytes(old)
+            self.evictions += 1
+        return surface
+
+
+sprite_cache = SpriteCache()
@@ -1,7 +1,12 @@
 import json
+import math
 import random
+from collections import OrderedDict
+
 import pygame
 
+from scripts.map_format import binary_map_path, load_map
+
 AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (0, 1)])): 0,
     tuple(sorted([(1, 0), (0, 1), (-1, 0)])): 1,
@@ -14,60 +19,21 @@ AUTOTILE_MAP = {
     tuple(sorted([(1, 0), (-1, 0), (0, 1), (0, -1)])): 8,
 }
 
-NEIGHBOR_OFFSETS = [
-    (-3, 3),
-    (-2, 3),
-    (-1, 3),
-    (0, 3),
-    (1, 3),
-    (2, 3),
-    (3, 3),
-    (-3, 2),
-    (-2, 2),
-    (-1, 2),
-    (0, 2),
-    (1, 2),
-    (2, 2),
-    (3, 2),
-    (-3, 1),
-    (-2, 1),
-    (-1, 1),
-    (0, 1),
-    (1, 1),
-    (2, 1),
-    (3, 1),
-    (-3, 0),
-    (-2, 0),
-    (-1, 0),
-    (0, 0),
-    (1, 0),
-    (2, 0),
-    (3, 0),
-    (-3, -1),
-    (-2, -1),
-    (-1, -1),
-    (0, -1),
-    (1, -1),
-    (2, -1),
-    (3, -1),
-    (-3, -2),
-    (-2, -2),
-    (-1, -2),
-    (0, -2),
-    (1, -2),
-    (2, -2),
-    (3, -2),
-    (-3, -3),
-    (-2, -3),
-    (-1, -3),
-    (0, -3),
-    (1, -3),
-    (2, -3),
-    (3, -3),
-]
 PHYSICS_TILES = {"grass", "stone", "wall", "jump_pad", "block"}
 AUTOTILE_TYPES = {"grass", "stone"}
 
+# falling blocks collide for as long as their original cell is within this
+# many tiles of the entity, i.e. over the first few tiles of their drop
+FALL_REACH = 3
+
+# maps whose bounding box would need more cells than this stay dict-only
+MAX_GRID_CELLS = 1 << 20
+
+# the static tile layer is pre-rendered in square chunks of CHUNK_SIZE tiles;
+# at most MAX_CHUNKS of them are kept, least recently drawn are evicted first
+CHUNK_SIZE = 8
+MAX_CHUNKS = 48
+
 
 class Tilemap:
     def __init__(self, game, tile_size=16):
@@ -75,6 +41,172 @@ class Tilemap:
         self.tile_size = tile_size
         self.tilemap = {}
         self.offgrid_tiles = []
+        self.build_grid()
+        self.clear_chunks()
+        self.rect_cache = None
+        self.rect_buffer = []
+        # a copy() shares its tile dicts with the original; owned holds the
+        # locations it has copied since, before changing them
+        self.shares_tiles = False
+        self.owned = set()
+
+    def copy(self):
+        tilemap = Tilemap(self.game, self.tile_size)
+        tilemap.tilemap = dict(self.tilemap)
+        tilemap.offgrid_tiles = list(self.offgrid_tiles)
+        if self.grid is None:
+            tilemap.grid = None
+        else:
+            tilemap.grid = list(self.grid)
+        tilemap.grid_x = self.grid_x
+        tilemap.grid_y = self.grid_y
+        tilemap.grid_width = self.grid_width
+        tilemap.grid_height = self.grid_height
+        tilemap.shares_tiles = True
+        return tilemap
+
+    def own(self, loc):
+        # the tile at loc, copied first if it is still shared with the original
+        tile = self.tilemap[loc]
+        if self.shares_tiles and loc not in self.owned:
+            self.owned.add(loc)
+            tile = dict(tile, pos=list(tile["pos"]))
+            self.tilemap[loc] = tile
+            if self.grid is not None:
+                self.grid[self.grid_index(loc)] = tile
+        return tile
+
+    def clear_chunks(self):
+        self.chunks = OrderedDict()
+        # tiles with a running shake or fall timer; update_effects() advances
+        # only these, and render() draws them one by one instead of baking
+        # them into the chunk surfaces until they settle
+        self.dynamic_tiles = set()
+        self.chunk_margin = None
+
+    def build_grid(self):
+        # self.tilemap is keyed by (x, y) tile coordinates; the grid is a dense
+        # row-major copy of it over the map's bounding box for range scans
+        self.grid = []
+        self.grid_x = 0
+        self.grid_y = 0
+        self.grid_width = 0
+        self.grid_height = 0
+        if not self.tilemap:
+            return
+
+        xs = [loc[0] for loc in self.tilemap]
+        ys = [loc[1] for loc in self.tilemap]
+        width = max(xs) - min(xs) + 1
+        height = max(ys) - min(ys) + 1
+        if width * height > MAX_GRID_CELLS:
+            self.grid = None
+            return
+
+        self.grid_x = min(xs)
+        self.grid_y = min(ys)
+        self.grid_width = width
+        self.grid_height = height
+        self.grid = [None] * (width * height)
+        for loc, tile in self.tilemap.items():
+            self.grid[(loc[1] - self.grid_y) * width + loc[0] - self.grid_x] = tile
+
+    def grid_index(self, loc):
+        x = loc[0] - self.grid_x
+        y = loc[1] - self.grid_y
+        if 0 <= x < self.grid_width and 0 <= y < self.grid_height:
+            return y * self.grid_width + x
+
+    def set_tile(self, loc, tile):
+        if loc in self.tilemap:
+            self.invalidate_tile(self.tilemap[loc])
+        self.tilemap[loc] = tile
+        self.rect_cache = None
+        if self.grid is not None:
+            index = self.grid_index(loc)
+            if index is None:
+                self.build_grid()
+            else:
+                self.grid[index] = tile
+        self.chunk_margin = None
+        self.invalidate_tile(tile)
+
+    def remove_tile(self, loc):
+        tile = self.tilemap.pop(loc)
+        if self.rect_cache is not None:
+            self.rect_cache.pop(loc, None)
+        if self.grid is not None:
+            self.grid[self.grid_index(loc)] = None
+        if loc in self.dynamic_tiles:
+            self.dynamic_tiles.discard(loc)
+        else:
+            self.invalidate_tile(tile)
+
+    def add_offgrid(self, tile):
+        self.offgrid_tiles.append(tile)
+        self.invalidate_tile(tile, offgrid=True)
+
+    def remove_offgrid(self, tile):
+        self.offgrid_tiles.remove(tile)
+        self.invalidate_tile(tile, offgrid=True)
+
+    def invalidate_tile(self, tile, offgrid=False):
+        if not self.chunks:
+            return
+        # the game has no images for spawners; they only ever cover one cell
+        size = (self.tile_size, self.tile_size)
+        if tile["type"] in self.game.assets:
+            size = self.game.assets[tile["type"]][tile["variant"]].get_size()
+        scale = 1 if offgrid else self.tile_size
+        self.invalidate_rect(
+            pygame.Rect(
+                tile["pos"][0] * scale,
+                tile["pos"][1] * scale,
+                size[0] + 1,
+                size[1],
+            )
+        )
+
+    def invalidate_rect(self, rect):
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(rect.left // chunk_px, rect.right // chunk_px + 1):
+            for cy in range(rect.top // chunk_px, rect.bottom // chunk_px + 1):
+                self.chunks.pop((cx, cy), None)
+
+    def set_dynamic(self, loc):
+        if loc not in self.dynamic_tiles:
+            self.dynamic_tiles.add(loc)
+            self.invalidate_tile(self.tilemap[loc])
+            if self.rect_cache is not None:
+                self.rect_cache.pop(loc, None)
+
+    def settle(self, loc):
+        self.dynamic_tiles.discard(loc)
+        self.invalidate_tile(self.tilemap[loc])
+        if self.rect_cache is not None and loc in self.rect_cache:
+            self.rect_cache[loc] = self.tile_rect(self.tilemap[loc])
+
+    def tiles_in_area(self, x0, y0, x1, y1):
+        # tiles with x0 <= x < x1 and y0 <= y < y1, row by row
+        if self.grid is None:
+            for y in range(y0, y1):
+                for x in range(x0, x1):
+                    tile = self.tilemap.get((x, y))
+                    if tile is not None:
+                        yield tile
+            return
+
+        x0 = max(x0 - self.grid_x, 0)
+        x1 = min(x1 - self.grid_x, self.grid_width)
+        if x0 >= x1:
+            return
+        for y in range(
+            max(y0 - self.grid_y, 0), min(y1 - self.grid_y, self.grid_height)
+        ):
+            row = y * self.grid_width
+            for tile in self.grid[row + x0 : row + x1]:
+                if tile is not None:
+                    yield tile
 
     def extract(self, id_pairs, keep=False):
         matches = []
@@ -82,9 +214,9 @@ class Tilemap:
             if (tile["type"], tile["variant"]) in id_pairs:
                 matches.append(tile.copy())
                 if not keep:
-                    self.offgrid_tiles.remove(tile)
+                    self.remove_offgrid(tile)
 
-        for loc in self.tilemap.copy():
+        for loc in list(self.tilemap):
             tile = self.tilemap[loc]
             if (tile["type"], tile["variant"]) in id_pairs:
                 matches.append(tile.copy())
@@ -92,30 +224,18 @@ class Tilemap:
                 matches[-1]["pos"][0] *= self.tile_size
                 matches[-1]["pos"][1] *= self.tile_size
                 if not keep:
-                    del self.tilemap[loc]
+                    self.remove_tile(loc)
 
         return matches
 
-    def tiles_around(self, pos):
-        tiles = []
-        tile_loc = (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
-        for (
-            offset
-        ) in (
-            NEIGHBOR_OFFSETS
-        ):  # warning: breaks on entity enlargement. NEIGHBOR_OFFSETS must be adjusted
-            check_loc = (
-                str(tile_loc[0] + offset[0]) + ";" + str(tile_loc[1] + offset[1])
-            )
-            if check_loc in self.tilemap:
-                tiles.append(self.tilemap[check_loc])
-        return tiles
-
     def save(self, path):
         f = open(path, "w")
         json.dump(
             {
-                "tilemap": self.tilemap,
+                "tilemap": {
+                    str(loc[0]) + ";" + str(loc[1]): tile
+                    for loc, tile in self.tilemap.items()
+                },
                 "tile_size": self.tile_size,
                 "offgrid": self.offgrid_tiles,
             },
@@ -124,55 +244,69 @@ class Tilemap:
         f.close()
 
     def load(self, path):
+        # a converted binary copy of the map (see map_convert.py) is read instead
+        # of the JSON when it is up to date
+        binary = binary_map_path(path)
+        if binary is not None:
+            self.tilemap, self.tile_size, self.offgrid_tiles = load_map(binary)
+            self.clear_chunks()
+            self.rect_cache = None
+            self.build_grid()
+            return
+
         f = open(path, "r")
         map_data = json.load(f)
         f.close()
 
-        self.tilemap = map_data["tilemap"]
+        self.tilemap = {}
+        for key, tile in map_data["tilemap"].items():
+            x, y = key.split(";")
+            self.tilemap[(int(x), int(y))] = tile
         self.tile_size = map_data["tile_size"]
         self.offgrid_tiles = map_data["offgrid"]
+        self.clear_chunks()
+        self.rect_cache = None
 
-        for tile_loc in self.tilemap:
-            self.tilemap[tile_loc]["blockShake"] = 0
-            self.tilemap[tile_loc]["falling"] = 0
-            if self.tilemap[tile_loc]["type"] == "wall":
-                if self.tilemap[tile_loc]["variant"] == 0:
-                    self.tilemap[tile_loc]["health"] = 5
+        for tile in self.tilemap.values():
+            tile["blockShake"] = 0
+            tile["falling"] = 0
+            if tile["type"] == "wall":
+                if tile["variant"] == 0:
+                    tile["health"] = 5
                 else:
-                    self.tilemap[tile_loc]["health"] = 1
+                    tile["health"] = 1
+        self.build_grid()
 
     def solid_check(self, pos):
-        tile_loc = (
-            str(int(pos[0] // self.tile_size))
-            + ";"
-            + str(int(pos[1] // self.tile_size))
+        tile = self.tilemap.get(
+            (int(pos[0] // self.tile_size), int(pos[1] // self.tile_size))
         )
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]["type"] in PHYSICS_TILES:
-                return self.tilemap[tile_loc]
+        if tile is not None and tile["type"] in PHYSICS_TILES:
+            return tile
 
-    def block_check(self, player):
-        keys_to_delete = []
-        for tile_loc in self.tilemap:
-            if (
-                self.tilemap[tile_loc]["type"] == "block"
-                and self.tilemap[tile_loc]["falling"] > 0
-            ):
-                self.tilemap[tile_loc]["falling"] += 1
-                if self.tilemap[tile_loc]["falling"] > 10:
-                    self.tilemap[tile_loc]["pos"][1] += (
-                        self.tilemap[tile_loc]["falling"] / 500
-                    )
-            if self.tilemap[tile_loc]["falling"] > 300:
-                keys_to_delete.append(tile_loc)
+    def update_effects(self):
+        for loc in sorted(self.dynamic_tiles):
+            tile = self.tilemap[loc]
+            if tile["falling"] > 0:
+                tile["falling"] += 1
+                if tile["falling"] > 10:
+                    tile["pos"][1] += tile["falling"] / 500
+                if tile["falling"] > 300:
+                    self.remove_tile(loc)
+                    continue
 
-        for key in keys_to_delete:
-            del self.tilemap[key]
-                
+            if tile["blockShake"] > 0:
+                tile["blockShake"] -= 1
+            elif tile["blockShake"] < 0:
+                tile["blockShake"] += 1
+
+            if not tile["blockShake"] and not tile["falling"]:
+                self.settle(loc)
+
+    def block_check(self, player):
         tile_loc = (
-            str(int(player.pos[0] // self.tile_size))
-            + ";"
-            + str(int(player.pos[1] // self.tile_size + 1))
+            int(player.pos[0] // self.tile_size),
+            int(player.pos[1] // self.tile_size + 1),
         )
         player_rect = player.rect()
         if tile_loc in self.tilemap:
@@ -181,38 +315,114 @@ class Tilemap:
                     player_rect.bottom >= self.tilemap[tile_loc]["pos"][1]
                     and self.tilemap[tile_loc]["falling"] == 0
                 ):
-                    self.tilemap[tile_loc]["falling"] = 1
+                    self.own(tile_loc)["falling"] = 1
+                    self.set_dynamic(tile_loc)
 
-    def wall_check(self, pos, speed):
-        tile_loc = (
-            str(int(pos[0] // self.tile_size))
-            + ";"
-            + str(int(pos[1] // self.tile_size))
-        )
-        if tile_loc in self.tilemap:
-            if self.tilemap[tile_loc]["type"] == "wall":
-                self.tilemap[tile_loc]["health"] -= 1
-                self.tilemap[tile_loc]["pos"][0] += 0.01
-                if speed[0] > 1:
-                    self.tilemap[tile_loc]["blockShake"] = 60
+    def damage_wall(self, tile_loc, speed):
+        # returns True when the hit breaks the wall
+        tile = self.own(tile_loc)
+        tile["health"] -= 1
+        tile["pos"][0] += 0.01
+        if speed[0] > 1:
+            tile["blockShake"] = 60
+        else:
+            tile["blockShake"] = -60
+        if tile["health"] == 0:
+            self.remove_tile(tile_loc)
+            return True
+        self.set_dynamic(tile_loc)
+        return False
+
+    def raycast(self, start, end):
+        # walks the cells on the segment start -> end in order and returns
+        # (tile_loc, face, hit_pos) for the first solid one, or None; face is
+        # the side of the tile that was crossed, None if start is inside it
+        tile_x = int(start[0] // self.tile_size)
+        tile_y = int(start[1] // self.tile_size)
+        if self.solid_check(start):
+            return (tile_x, tile_y), None, (start[0], start[1])
+
+        dx = end[0] - start[0]
+        dy = end[1] - start[1]
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        if dx:
+            next_x = (tile_x + (step_x > 0)) * self.tile_size
+            t_max_x = (next_x - start[0]) / dx
+            t_delta_x = self.tile_size / abs(dx)
+        else:
+            t_max_x = t_delta_x = math.inf
+        if dy:
+            next_y = (tile_y + (step_y > 0)) * self.tile_size
+            t_max_y = (next_y - start[1]) / dy
+            t_delta_y = self.tile_size / abs(dy)
+        else:
+            t_max_y = t_delta_y = math.inf
+
+        while True:
+            if t_max_x < t_max_y:
+                t = t_max_x
+                tile_x += step_x
+                t_max_x += t_delta_x
+                face = "left" if step_x > 0 else "right"
+            else:
+                t = t_max_y
+                tile_y += step_y
+                t_max_y += t_delta_y
+                face = "top" if step_y > 0 else "bottom"
+            if t > 1:
+                return None
+
+            tile = self.tilemap.get((tile_x, tile_y))
+            if tile is not None and tile["type"] in PHYSICS_TILES:
+                # stop just short of the face so the hit point is outside the tile
+                hit_pos = [start[0] + dx * t, start[1] + dy * t]
+                if face == "left" or face == "right":
+                    hit_pos[0] -= step_x * 0.01
                 else:
-                    self.tilemap[tile_loc]["blockShake"] = -60
-                if self.tilemap[tile_loc]["health"] == 0:
-                    del self.tilemap[tile_loc]
-                return tile_loc
-
-    def physics_rects_around(self, pos):
-        rects = []
-        for tile in self.tiles_around(pos):
-            if tile["type"] in PHYSICS_TILES:
-                rects.append(
-                    pygame.Rect(
-                        tile["pos"][0] * self.tile_size,
-                        tile["pos"][1] * self.tile_size,
-                        self.tile_size,
-                        self.tile_size,
-                    )
-                )
+                    hit_pos[1] -= step_y * 0.01
+                return (tile_x, tile_y), face, tuple(hit_pos)
+
+    def tile_rect(self, tile):
+        return pygame.Rect(
+            tile["pos"][0] * self.tile_size,
+            tile["pos"][1] * self.tile_size,
+            self.tile_size,
+            self.tile_size,
+        )
+
+    def build_rect_cache(self):
+        self.rect_cache = {}
+        for loc, tile in self.tilemap.items():
+            if tile["type"] in PHYSICS_TILES and loc not in self.dynamic_tiles:
+                self.rect_cache[loc] = self.tile_rect(tile)
+
+    def physics_rects_in(self, rect):
+        # rects of the solid tiles whose cell overlaps rect, for any rect size;
+        # the returned list is reused by the next call and must not be kept
+        if self.rect_cache is None:
+            self.build_rect_cache()
+        rects = self.rect_buffer
+        rects.clear()
+
+        x0 = rect.left // self.tile_size
+        y0 = rect.top // self.tile_size
+        x1 = (rect.right - 1) // self.tile_size + 1
+        y1 = (rect.bottom - 1) // self.tile_size + 1
+        get_rect = self.rect_cache.get
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                tile_rect = get_rect((x, y))
+                if tile_rect is not None:
+                    rects.append(tile_rect)
+
+        for loc in self.dynamic_tiles:
+            if (
+                x0 - FALL_REACH <= loc[0] < x1 + FALL_REACH
+                and y0 - FALL_REACH <= loc[1] < y1 + FALL_REACH
+                and self.tilemap[loc]["type"] in PHYSICS_TILES
+            ):
+                rects.append(self.tile_rect(self.tilemap[loc]))
         return rects
 
     def autotile(self):
@@ -220,51 +430,129 @@ class Tilemap:
             tile = self.tilemap[loc]
             neighbors = set()
             for shift in [(1, 0), (-1, 0), (0, -1), (0, 1)]:
-                check_loc = (
-                    str(tile["pos"][0] + shift[0])
-                    + ";"
-                    + str(tile["pos"][1] + shift[1])
-                )
+                check_loc = (loc[0] + shift[0], loc[1] + shift[1])
                 if check_loc in self.tilemap:
                     if self.tilemap[check_loc]["type"] == tile["type"]:
                         neighbors.add(shift)
             neighbors = tuple(sorted(neighbors))
             if (tile["type"] in AUTOTILE_TYPES) and (neighbors in AUTOTILE_MAP):
                 tile["variant"] = AUTOTILE_MAP[neighbors]
+        self.chunks.clear()
+
+    def bake_chunk(self, chunk_loc):
+        if self.chunk_margin is None:
+            # tiles wider than a cell spill into the chunks right of and below them
+            size = self.tile_size
+            for tile_type in {tile["type"] for tile in self.tilemap.values()}:
+                for img in self.game.assets[tile_type]:
+                    size = max(size, img.get_width(), img.get_height())
+            self.chunk_margin = (size - 1) // self.tile_size
+
+        chunk_px = CHUNK_SIZE * self.tile_size
+        origin = (chunk_loc[0] * chunk_px, chunk_loc[1] * chunk_px)
+        chunk_rect = pygame.Rect(origin, (chunk_px, chunk_px))
+        blits = []
 
-    def render(self, surf, offset=(0, 0)):
         for tile in self.offgrid_tiles:
-            surf.blit(
-                self.game.assets[tile["type"]][tile["variant"]],
-                (tile["pos"][0] - offset[0], tile["pos"][1] - offset[1]),
+            img = self.game.assets[tile["type"]][tile["variant"]]
+            if chunk_rect.colliderect(
+                (tile["pos"][0], tile["pos"][1], img.get_width(), img.get_height())
+            ):
+                # floor so tiles hanging over the chunk's top left edge land on
+                # the same pixel as when they are drawn straight to the screen
+                blits.append(
+                    (
+                        img,
+                        (
+                            math.floor(tile["pos"][0]) - origin[0],
+                            math.floor(tile["pos"][1]) - origin[1],
+                        ),
+                    )
+                )
+
+        x0 = chunk_loc[0] * CHUNK_SIZE
+        y0 = chunk_loc[1] * CHUNK_SIZE
+        dynamic = {id(self.tilemap[loc]) for loc in self.dynamic_tiles}
+        tiles = [
+            tile
+            for tile in self.tiles_in_area(
+                x0 - self.chunk_margin,
+                y0 - self.chunk_margin,
+                x0 + CHUNK_SIZE,
+                y0 + CHUNK_SIZE,
             )
+            if id(tile) not in dynamic
+        ]
+        # same column-major order as drawing the cells one by one
+        tiles.sort(key=lambda tile: (tile["pos"][0], tile["pos"][1]))
+        for tile in tiles:
+            blits.append(
+                (
+                    self.game.assets[tile["type"]][tile["variant"]],
+                    (
+                        math.floor(tile["pos"][0] * self.tile_size) - origin[0],
+                        math.floor(tile["pos"][1] * self.tile_size) - origin[1],
+                    ),
+                )
+            )
+
+        if not blits:
+            return None
+        # tiles are colorkeyed on black, so the chunk can be as well, which
+        # blits much faster than a per-pixel alpha surface
+        surf = pygame.Surface((chunk_px, chunk_px))
+        surf.blits(blits, doreturn=False)
+        surf.set_colorkey((0, 0, 0), pygame.RLEACCEL)
+        return surf
 
-        for x in range(
-            offset[0] // self.tile_size,
-            (offset[0] + surf.get_width()) // self.tile_size + 1,
+    def render(self, surf, offset=(0, 0)):
+        baked = self.render_chunks(surf, offset)
+        self.render_dynamic(surf, offset)
+        return baked
+
+    def render_chunks(self, surf, offset=(0, 0)):
+        # returns True if a chunk had to be baked, i.e. the static layer may
+        # look different from the previous frame
+        baked = False
+        chunk_px = CHUNK_SIZE * self.tile_size
+        for cx in range(
+            offset[0] // chunk_px, (offset[0] + surf.get_width()) // chunk_px + 1
         ):
-            for y in range(
-                offset[1] // self.tile_size,
-                (offset[1] + surf.get_height()) // self.tile_size + 1,
+            for cy in range(
+                offset[1] // chunk_px, (offset[1] + surf.get_height()) // chunk_px + 1
             ):
-                loc = str(x) + ";" + str(y)
-                if loc in self.tilemap:
-                    if self.tilemap[loc]["blockShake"] > 0:
-                        self.tilemap[loc]["blockShake"] -= 1
-                    elif self.tilemap[loc]["blockShake"] < 0:
-                        self.tilemap[loc]["blockShake"] += 1
-
-                    blockShake = self.tilemap[loc]["blockShake"]
-                    tile = self.tilemap[loc]
+                if (cx, cy) in self.chunks:
+                    self.chunks.move_to_end((cx, cy))
+                else:
+                    self.chunks[(cx, cy)] = self.bake_chunk((cx, cy))
+                    baked = True
+                    while len(self.chunks) > MAX_CHUNKS:
+                        self.chunks.popitem(last=False)
+                chunk = self.chunks[(cx, cy)]
+                if chunk is not None:
                     surf.blit(
-                        self.game.assets[tile["type"]][tile["variant"]],
-                        (
-                            tile["pos"][0] * self.tile_size
-                            - offset[0]
-                            + blockShake / 30,
-                            tile["pos"][1] * self.tile_size - offset[1],
-                        ),
+                        chunk, (cx * chunk_px - offset[0], cy * chunk_px - offset[1])
                     )
+        return baked
+
+    def render_dynamic(self, surf, offset=(0, 0)):
+        x0 = offset[0] // self.tile_size
+        y0 = offset[1] // self.tile_size
+        x1 = (offset[0] + surf.get_width()) // self.tile_size
+        y1 = (offset[1] + surf.get_height()) // self.tile_size
+        for loc in sorted(self.dynamic_tiles):
+            if not (x0 <= loc[0] <= x1 and y0 <= loc[1] <= y1):
+                continue
+            tile = self.tilemap[loc]
+            surf.blit(
+                self.game.assets[tile["type"]][tile["variant"]],
+                (
+                    tile["pos"][0] * self.tile_size
+                    - offset[0]
+                    + tile["blockShake"] / 30,
+                    tile["pos"][1] * self.tile_size - offset[1],
+                ),
+            )
 
     def find_lowest_block_position(self):
         lowest_y = float("-inf")
@@ -1,23 +1,53 @@
 import os
+import threading
 
 import pygame
 
+from scripts.asset_pack import AssetPack, PACK_PATH
+
 BASE_IMG_PATH = "data/images/"
 
+# opened on the first load, once there is a display to convert the pages for.
+# The asset registry loads on a worker thread too, so only one thread opens it.
+packs = {}
+packs_lock = threading.Lock()
+
+
+def get_pack(path=PACK_PATH):
+    if path not in packs:
+        with packs_lock:
+            if path not in packs:
+                packs[path] = AssetPack.open(path, BASE_IMG_PATH)
+    return packs[path]
+
+
+def load_image(path, conversion=0, size=None):
+    pack = get_pack()
+    if pack is not None:
+        images = pack.get(path, conversion, size)
+        if images is not None:
+            return images[0]
 
-def load_image(path, conversion=0):
     if conversion == 0:
         img = pygame.image.load(BASE_IMG_PATH + path).convert()
         img.set_colorkey((0, 0, 0, 0))
     else:
         img = pygame.image.load(BASE_IMG_PATH + path).convert_alpha()
+    if size is not None:
+        img = pygame.transform.scale(img, size)
     return img
 
 
-def load_images(path, conversion=0):
+def load_images(path, conversion=0, size=None):
+    pack = get_pack()
+    if pack is not None:
+        images = pack.get(path, conversion, size)
+        if images is not None:
+            return images
+
     images = []
     for img_name in sorted(os.listdir(BASE_IMG_PATH + path)):
-        images.append(load_image(path + "/" + img_name, conversion))
+        images.append(load_image(path + "/" + img_name, conversion, size))
     return images
 
 
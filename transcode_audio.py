@@ -0,0 +1,68 @@
+import os
+import shutil
+import argparse
+import subprocess
+
+from scripts.audio import COMPRESSED_EXT, MUSIC, SFX, STREAMED
+
+
+def default_paths():
+    # streamed sounds are read as PCM a chunk at a time, so they stay WAV
+    paths = [MUSIC]
+    for name, path in SFX.items():
+        if name not in STREAMED and not path.endswith(COMPRESSED_EXT):
+            paths.append(path)
+    return paths
+
+
+def encoder_command(path, out, quality):
+    if shutil.which("ffmpeg"):
+        return [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-y",
+            "-i",
+            path,
+            "-c:a",
+            "libvorbis",
+            "-q:a",
+            str(quality),
+            out,
+        ]
+    if shutil.which("oggenc") and path.endswith(".wav"):
+        return ["oggenc", "-Q", "-q", str(quality), "-o", out, path]
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=f"transcode the music and sound effects to Ogg Vorbis; the "
+        f"{COMPRESSED_EXT} files go next to the originals, which the game reads "
+        "instead while they are up to date"
+    )
+    parser.add_argument(
+        "paths", nargs="*", help="sounds to transcode (default: the music and sfx)"
+    )
+    parser.add_argument("--quality", type=int, default=4, help="Vorbis quality, 0-10")
+    args = parser.parse_args()
+    if not shutil.which("ffmpeg") and not shutil.which("oggenc"):
+        parser.error("transcoding needs ffmpeg (or oggenc for WAV files)")
+
+    for path in args.paths or default_paths():
+        if not os.path.exists(path):
+            print(f"{path} is missing, skipped")
+            continue
+        out = os.path.splitext(path)[0] + COMPRESSED_EXT
+        command = encoder_command(path, out, args.quality)
+        if command is None:
+            print(f"{path} needs ffmpeg to transcode, skipped")
+            continue
+        subprocess.run(command, check=True)
+        print(
+            f"{path} ({os.path.getsize(path)} bytes) -> {out} ({os.path.getsize(out)} bytes)"
+        )
+
+
+if __name__ == "__main__":
+    main()